@@ -9,8 +9,26 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+from KONNECT_INC import startup
+
+# get_asgi_application() split into timed phases, as in wsgi.py.
+with startup.phase('import django'):
+    import django
+    from django.core.handlers.asgi import ASGIHandler
+    from django.core.signals import request_started
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'KONNECT_INC.settings')
+# Served over ASGI, so route to the async views (see shop.urls).
+os.environ.setdefault('SERVING_PROFILE', 'asgi')
+
+with startup.phase('settings'):
+    from django.conf import settings
+    settings.INSTALLED_APPS
+
+with startup.phase('apps'):
+    django.setup(set_prefix=False)
+
+with startup.phase('middleware'):
+    application = ASGIHandler()
 
-application = get_asgi_application()
+request_started.connect(startup.first_request_started)
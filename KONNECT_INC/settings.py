@@ -11,11 +11,11 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 from pathlib import Path
+import hashlib
 import os
+import tempfile
 import dj_database_url
 import cloudinary
-import cloudinary.uploader
-import cloudinary.api
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -70,6 +70,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so /health/ and /ready/ skip everything below (see shop.health).
+    'shop.health.HealthCheckMiddleware',
+    # Next, so its timings cover the rest of the stack (see shop.metrics).
+    'shop.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -112,6 +116,46 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# File-based so every gunicorn worker on the instance sees the same
+# catalog version (LocMemCache is per-process and would serve stale pages).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'konnect_cache')),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+}
+
+# Identifies the deployed code: part of the storefront ETags and cache
+# keys, so a deploy that changes a page or a JSON shape isn't answered
+# with a 304 or a snapshot made by the old code.  Render provides the
+# commit; elsewhere, hash the app's code and templates.
+def _source_hash():
+    digest = hashlib.sha256()
+    for path in sorted(
+        p for app in ('KONNECT_INC', 'shop') for p in (BASE_DIR / app).rglob('*')
+        if p.suffix in ('.py', '.html', '.js', '.css') and '__pycache__' not in p.parts
+    ):
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+BUILD_ID = (os.environ.get('RENDER_GIT_COMMIT') or _source_hash())[:12]
+
+# Upper bound on how long a catalog snapshot lives, as a safety net for
+# edits that bypass model signals (e.g. raw SQL in a shell).
+CATALOG_CACHE_TIMEOUT = int(os.environ.get('CATALOG_CACHE_TIMEOUT', 3600))
+
+# Where the pre-built product catalogue PDF is kept (see shop.catalogue_pdf).
+CATALOGUE_PDF_DIR = os.environ.get('CATALOGUE_PDF_DIR', os.path.join(tempfile.gettempdir(), 'konnect_catalogue'))
+# Downloads start a rebuild at most this often (seconds); the previous
+# file is served in between.
+CATALOGUE_PDF_REBUILD_INTERVAL = int(os.environ.get('CATALOGUE_PDF_REBUILD_INTERVAL', 300))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -178,6 +222,69 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Paystack Configuration
 PAYSTACK_SECRET_KEY = os.environ.get('PAYSTACK_SECRET_KEY', 'sk_test_00368579d28a59477f6ef54414fbe65602adbb97')
 PAYSTACK_PUBLIC_KEY = os.environ.get('PAYSTACK_PUBLIC_KEY', 'pk_test_3c4130cf2ffa483ade57eddac4504bc706e52bac')
+PAYSTACK_API_URL = os.environ.get('PAYSTACK_API_URL', 'https://api.paystack.co')
+# Load testing: PAYSTACK_FAKE=True points checkout at the local stand-in
+# started with `python manage.py fake_paystack` instead of the live API.
+PAYSTACK_FAKE = os.environ.get('PAYSTACK_FAKE', 'False').lower() == 'true'
+PAYSTACK_FAKE_ADDRESS = os.environ.get('PAYSTACK_FAKE_ADDRESS', '127.0.0.1:8765')
+if PAYSTACK_FAKE:
+    PAYSTACK_API_URL = f'http://{PAYSTACK_FAKE_ADDRESS}'
+# Seconds to wait for the TCP/TLS connection and for each response read.
+# Checkout runs on a handful of gunicorn threads, so keep these tight.
+PAYSTACK_CONNECT_TIMEOUT = float(os.environ.get('PAYSTACK_CONNECT_TIMEOUT', 3.05))
+PAYSTACK_READ_TIMEOUT = float(os.environ.get('PAYSTACK_READ_TIMEOUT', 10))
+PAYSTACK_MAX_RETRIES = int(os.environ.get('PAYSTACK_MAX_RETRIES', 2))
+# Keep-alive connections per process; at least the gunicorn thread count,
+# and the reconcile_payments worker count.
+PAYSTACK_POOL_SIZE = int(os.environ.get('PAYSTACK_POOL_SIZE', 10))
+# Cap on concurrent Paystack calls per ASGI worker (async views only).
+PAYSTACK_ASYNC_MAX_CONNECTIONS = int(os.environ.get('PAYSTACK_ASYNC_MAX_CONNECTIONS', 200))
+
+# Stock reservations: when > 0, create_order holds the cart's stock for this
+# many seconds while the shopper pays; expired holds are released in bulk
+# (see shop.orders.release_expired_reservations). 0 keeps the old behaviour
+# of only taking stock once payment succeeds.
+STOCK_RESERVATION_TTL = int(os.environ.get('STOCK_RESERVATION_TTL', 0))
+
+# manage.py sweep_orders: pending orders older than this many hours are
+# cancelled, and closed orders older than this many days are archived.
+PENDING_ORDER_MAX_AGE_HOURS = int(os.environ.get('PENDING_ORDER_MAX_AGE_HOURS', 24))
+ORDER_RETENTION_DAYS = int(os.environ.get('ORDER_RETENTION_DAYS', 180))
+
+# How long create_order remembers a successful response per Idempotency-Key
+# (see shop.idempotency); repeats inside the window are replayed.
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 3600))
+
+# How gunicorn serves the app (see gunicorn.conf.py): 'gthread' (WSGI) or
+# 'asgi' (uvicorn workers, with the async checkout/catalog/webhook views).
+SERVING_PROFILE = os.environ.get('SERVING_PROFILE', 'gthread')
+ASYNC_VIEWS = SERVING_PROFILE == 'asgi'
+
+# Per-probe budget for /ready/'s database and cache checks (see shop.health).
+HEALTH_CHECK_TIMEOUT = float(os.environ.get('HEALTH_CHECK_TIMEOUT', 1.0))
+
+# /metrics accepts "Authorization: Bearer <METRICS_TOKEN>" (or a staff
+# login); requests slower than SLOW_REQUEST_SECONDS are logged with their SQL.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS', 1.0))
+
+# Gunicorn workers prime the URLconf, database, templates and catalog
+# cache before taking traffic (see shop.warmup and gunicorn.conf.py).
+STARTUP_WARMUP = os.environ.get('STARTUP_WARMUP', 'True').lower() == 'true'
+
+# Send the project's own log lines (Paystack latency, startup report,
+# oversell warnings) to stderr, which Render and gunicorn collect.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'KONNECT_INC': {'handlers': ['console'], 'level': os.environ.get('LOG_LEVEL', 'INFO')},
+        'shop': {'handlers': ['console'], 'level': os.environ.get('LOG_LEVEL', 'INFO')},
+    },
+}
 
 # Security settings for production
 if not DEBUG:
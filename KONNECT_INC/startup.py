@@ -0,0 +1,70 @@
+"""
+Startup timing report.
+
+On Render's free plan the service sleeps when idle, so the first shopper
+after a quiet spell waits for a whole cold boot.  ``wsgi.py`` and the
+gunicorn warm-up hook time each phase of that boot here, and the first
+request served adds the time to first byte.  The report is logged once
+per worker when the first request arrives; ``manage.py startup_report``
+measures a fresh boot on demand.
+
+Deliberately free of Django imports: it is loaded before settings.
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+logger = logging.getLogger(__name__)
+
+# wsgi.py imports this module first, so boot time is measured from here.
+BOOT_STARTED = time.perf_counter()
+
+_phases = []
+_first_request = None
+_lock = threading.Lock()
+
+
+@contextmanager
+def phase(name):
+    """Time the enclosed block as startup phase ``name``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases.append((name, time.perf_counter() - started))
+
+
+def report():
+    """Phase timings in milliseconds for this process."""
+    return {
+        'pid': os.getpid(),
+        'phases': {name: round(seconds * 1000, 1) for name, seconds in _phases},
+        'boot_ms': round(sum(seconds for _, seconds in _phases) * 1000, 1),
+        'first_request_ms': None if _first_request is None else round(_first_request * 1000, 1),
+    }
+
+
+def format_report(data=None):
+    data = data or report()
+    phases = ', '.join(f'{name} {ms:.0f}ms' for name, ms in data['phases'].items())
+    line = f"startup (pid {data['pid']}): {phases}; boot {data['boot_ms']:.0f}ms"
+    if data['first_request_ms'] is not None:
+        line += f"; first request {data['first_request_ms']:.0f}ms after boot began"
+    return line
+
+
+def first_request_started(**kwargs):
+    """``request_started`` receiver: log the report once, on the first request."""
+    global _first_request
+    with _lock:
+        if _first_request is not None:
+            return
+        _first_request = time.perf_counter() - BOOT_STARTED
+    from django.core.signals import request_started
+
+    request_started.disconnect(first_request_started)
+    logger.info(format_report())
@@ -10,3 +10,6 @@ python manage.py collectstatic --no-input
 
 # Run migrations
 python manage.py migrate
+
+# Stored Cloudinary variants for products saved before they existed
+python manage.py backfill_media_urls
@@ -1,12 +1,109 @@
-"""Gunicorn configuration for Render deployment."""
+"""Gunicorn configuration for Render deployment.
 
-import multiprocessing
+Pick a serving profile with SERVING_PROFILE:
 
-# Use gthread worker so a single worker can handle multiple
-# concurrent requests (crucial on Render free tier where
-# WEB_CONCURRENCY is forced to 1).
-worker_class = "gthread"
-threads = 4
+* ``gthread`` (default): the WSGI app on threaded workers, sized from the
+  CPUs and memory the container actually gets.
+* ``asgi``: the ASGI app on uvicorn workers, one event loop per CPU.
+  Checkout, catalog and webhook views are async there, so a checkout
+  waiting on Paystack doesn't hold a thread (see shop.async_views).
+
+WEB_CONCURRENCY and GUNICORN_THREADS override the computed sizes (Render
+sets WEB_CONCURRENCY=1 on the free tier).  Start with plain ``gunicorn``:
+the app comes from ``wsgi_app`` below.
+"""
+
+import os
+import shutil
+import tempfile
+
+PROFILE = os.environ.get("SERVING_PROFILE", "gthread")
+
+# Rough resident size of one worker, used to keep the worker count
+# inside the container's memory limit.
+WORKER_MEMORY_MB = int(os.environ.get("GUNICORN_WORKER_MEMORY_MB", 160))
+
+
+def _cpu_count():
+    """CPUs this container may use: the cgroup quota if there is one."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return max(1, round(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return len(os.sched_getaffinity(0))
+
+
+def _memory_mb():
+    """Memory limit of this container in MB, or None if unknown."""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        # "max", or cgroup v1's "unlimited" of ~2**63.
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value) // (1024 * 1024)
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+    except (ValueError, OSError):
+        return None
+
+
+def _workers(per_cpu):
+    if os.environ.get("WEB_CONCURRENCY"):
+        return int(os.environ["WEB_CONCURRENCY"])
+    count = per_cpu(_cpu_count())
+    memory = _memory_mb()
+    if memory:
+        count = min(count, memory // WORKER_MEMORY_MB)
+    return max(1, count)
+
+
+if PROFILE == "asgi":
+    wsgi_app = "KONNECT_INC.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+    # Concurrency comes from the event loop, so one worker per CPU.
+    workers = _workers(lambda cpus: cpus)
+elif PROFILE == "gthread":
+    wsgi_app = "KONNECT_INC.wsgi:application"
+    # Use gthread worker so a single worker can handle multiple
+    # concurrent requests (crucial on Render free tier where
+    # WEB_CONCURRENCY is forced to 1).
+    worker_class = "gthread"
+    workers = _workers(lambda cpus: 2 * cpus + 1)
+    threads = int(os.environ.get("GUNICORN_THREADS", max(4, 2 * _cpu_count())))
+    # One pooled Paystack connection per thread (see shop.paystack).
+    os.environ.setdefault("PAYSTACK_POOL_SIZE", str(max(10, threads)))
+else:
+    raise RuntimeError(f"Unknown SERVING_PROFILE {PROFILE!r}; use 'gthread' or 'asgi'")
+
+# Load Django once in the master and fork workers from it: workers start
+# faster and share the imported code's memory.  Nothing touches the
+# database at import time, so no connection leaks into the fork.
+preload_app = True
+
+# Recycle workers now and then so a slow leak can't grow forever; the
+# jitter stops them all restarting at once.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+# Worker heartbeat files on tmpfs: a disk-backed /tmp can stall them
+# long enough for the master to think a worker hung.
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+# Every worker writes its metrics here and /metrics adds them up (see
+# shop.metrics).  Emptied at startup so a previous run isn't counted.
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "konnect-metrics"),
+)
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
 
 # Timeout: Render's health-check + cold starts need headroom.
 timeout = 120
@@ -19,3 +116,18 @@ keepalive = 5
 accesslog = "-"
 errorlog = "-"
 loglevel = "info"
+
+
+def post_worker_init(worker):
+    """Warm the worker up before it accepts requests (see shop.warmup)."""
+    from KONNECT_INC import startup
+    from shop.warmup import warm_up
+
+    warm_up()
+    worker.log.info(startup.format_report())
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
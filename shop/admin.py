@@ -1,17 +1,24 @@
-from django.contrib import admin
+import time
+import uuid
+from datetime import timedelta
+
+from django.contrib import admin, messages
+from django.db.models import F
 from django.utils.html import format_html
-from django.http import HttpResponse
-from django.urls import path
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.lib import colors
-from reportlab.lib.units import mm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
-
-from .models import Category, Products, Order, OrderItem
+from .analytics import sales_report
+from .order_export import FORMATS, export_orders
+from .catalogue_pdf import ensure_current_pdf, latest_pdf
+from .product_io import UPDATABLE_FIELDS, ImportFileError, apply_plan, export_rows, plan_import, read_sheet
+from .models import Category, Products, Order, OrderItem, WebhookEvent, DailySales, ArchivedOrder, ArchivedOrderItem
+from .search import filter_products
 
 
 class OrderItemInline(admin.TabularInline):
@@ -19,21 +26,36 @@ class OrderItemInline(admin.TabularInline):
     extra = 0
     readonly_fields = ['product', 'quantity', 'price', 'subtotal']
     
+    def get_queryset(self, request):
+        # Products.__str__ reads the category, and the line total is worked
+        # out by the database, so the inline costs one query however many
+        # lines the order has.
+        return (
+            super().get_queryset(request)
+            .select_related('product__category')
+            .annotate(line_total=F('quantity') * F('price'))
+        )
+    
     def subtotal(self, obj):
-        return f"₵{obj.subtotal:.2f}"
+        # The blank "add another" row isn't from get_queryset().
+        line_total = getattr(obj, 'line_total', None)
+        if line_total is None:
+            return '-'
+        return f"₵{line_total:.2f}"
 
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
-    list_display = ['order_id', 'full_name', 'email', 'total_amount', 'status', 'created_at']
-    list_filter = ['status', 'created_at']
+    list_display = ['order_id', 'full_name', 'email', 'total_amount', 'status', 'order_type', 'created_at']
+    list_filter = ['status', 'order_type', 'created_at']
     search_fields = ['order_id', 'full_name', 'email', 'phone']
-    readonly_fields = ['order_id', 'paystack_reference', 'created_at', 'updated_at']
+    readonly_fields = ['order_id', 'paystack_reference', 'created_at', 'updated_at', 'paid_at']
     inlines = [OrderItemInline]
+    actions = ['export_csv', 'export_ndjson']
     
     fieldsets = (
         ('Order Info', {
-            'fields': ('order_id', 'status', 'paystack_reference')
+            'fields': ('order_id', 'status', 'order_type', 'paystack_reference')
         }),
         ('Customer Info', {
             'fields': ('full_name', 'email', 'phone', 'address')
@@ -42,12 +64,112 @@ class OrderAdmin(admin.ModelAdmin):
             'fields': ('total_amount',)
         }),
         ('Timestamps', {
-            'fields': ('created_at', 'updated_at'),
+            'fields': ('created_at', 'updated_at', 'paid_at'),
             'classes': ('collapse',)
         }),
     )
 
 
+    # ── Exports for accounting (see shop.order_export) ──────
+    def _export(self, queryset, fmt):
+        content_type, extension = FORMATS[fmt]
+        now = timezone.localtime(timezone.now()).strftime('%Y-%m-%d_%H%M')
+        response = StreamingHttpResponse(export_orders(queryset, fmt), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="KONNECT_INC_Orders_{now}.{extension}"'
+        return response
+
+    @admin.action(description='Export selected orders with line items (CSV)')
+    def export_csv(self, request, queryset):
+        return self._export(queryset, 'csv')
+
+    @admin.action(description='Export selected orders with line items (NDJSON)')
+    def export_ndjson(self, request, queryset):
+        return self._export(queryset, 'ndjson')
+
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+    can_delete = False
+    readonly_fields = ['product_id', 'product_name', 'quantity', 'price']
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    """Orders moved out of the live tables by ``manage.py sweep_orders``."""
+    list_display = ['order_id', 'full_name', 'email', 'total_amount', 'status', 'created_at', 'archived_at']
+    list_filter = ['status', 'order_type']
+    search_fields = ['order_id', 'full_name', 'email', 'phone']
+    inlines = [ArchivedOrderItemInline]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    """Read-only view of the webhook inbox, for chasing failed events."""
+    list_display = ['event_id', 'event_type', 'received_at', 'processed_at', 'attempts']
+    list_filter = ['event_type', ('processed_at', admin.EmptyFieldListFilter)]
+    search_fields = ['event_id']
+    readonly_fields = ['event_id', 'event_type', 'payload', 'received_at', 'processed_at', 'attempts', 'last_error']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DailySales)
+class SalesReportAdmin(admin.ModelAdmin):
+    """Sales dashboard, read from the daily rollups (see shop.analytics)."""
+    PERIODS = [7, 30, 90, 365]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        today = timezone.localdate()
+        try:
+            days = max(int(request.GET.get('days', 30)), 1)
+            start = parse_date(request.GET.get('start', '')) or today - timedelta(days=days - 1)
+            end = parse_date(request.GET.get('end', '')) or today
+        except ValueError:
+            days, start, end = 30, today - timedelta(days=29), today
+        if start > end:
+            start, end = end, start
+
+        report = sales_report(start, end)
+        totals = report['totals']
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Sales report',
+            'opts': self.model._meta,
+            'periods': self.PERIODS,
+            'days': days,
+            'report': report,
+            'grand_total': {
+                key: sum((row[key] or 0) for row in totals.values())
+                for key in ('orders', 'units', 'revenue')
+            },
+            **(extra_context or {}),
+        }
+        return TemplateResponse(request, 'admin/shop/sales_report.html', context)
+
+
 # Register your models here.
 admin.site.register(Category)
 
@@ -62,6 +184,11 @@ class ProductsAdmin(admin.ModelAdmin):
     fields = ('category', 'product_name', 'product_code', 'is_new', 'product_price', 'wholesale_price', 'quantity_per_box', 'product_stock', 'wholesale_stock', 'product_image', 'image_preview', 'product_video', 'video_preview')
     change_list_template = 'admin/shop/products/change_list.html'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Served by the trigram / FTS5 index in shop.search instead of
+        # the default unindexed icontains scan over search_fields.
+        return filter_products(queryset, search_term), False
+
     # ── Custom URL for PDF download ──────────────────────────
     def get_urls(self):
         custom_urls = [
@@ -70,145 +197,127 @@ class ProductsAdmin(admin.ModelAdmin):
                 self.admin_site.admin_view(self.download_products_pdf),
                 name='shop_products_download_pdf',
             ),
+            path(
+                'import/',
+                self.admin_site.admin_view(self.import_products),
+                name='shop_products_import',
+            ),
+            path(
+                'export-csv/',
+                self.admin_site.admin_view(self.export_products_csv),
+                name='shop_products_export_csv',
+            ),
         ]
         return custom_urls + super().get_urls()
 
-    def download_products_pdf(self, request):
-        """Generate a well-structured PDF of all products."""
-        response = HttpResponse(content_type='application/pdf')
+    # ── Bulk import / export (see shop.product_io) ───────────
+    IMPORT_PREVIEW_ROWS = 200
+    # Product codes named in the "skipped" message after an apply.
+    IMPORT_CONFLICTS_SHOWN = 10
+    IMPORT_PLAN_TIMEOUT = 3600
+
+    def import_products(self, request):
+        """Upload a CSV/XLSX, preview the changes, then apply them."""
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        changelist_url = reverse('admin:shop_products_changelist')
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Import products',
+            'opts': self.model._meta,
+            'columns': list(UPDATABLE_FIELDS),
+        }
+
+        if request.method == 'POST' and request.POST.get('plan'):
+            plan_key = f"product_import:{request.user.pk}:{request.POST['plan']}"
+            plan = cache.get(plan_key)
+            if plan is None:
+                self.message_user(request, 'That import preview has expired; please upload the file again.', messages.ERROR)
+                return HttpResponseRedirect(request.path)
+            started = time.perf_counter()
+            updated, conflicts = apply_plan(plan)
+            cache.delete(plan_key)
+            self.message_user(
+                request,
+                f'Updated {updated} product{"" if updated == 1 else "s"} in {time.perf_counter() - started:.1f}s.',
+                messages.SUCCESS,
+            )
+            if conflicts:
+                shown = ', '.join(code for code, _ in conflicts[:self.IMPORT_CONFLICTS_SHOWN])
+                self.message_user(
+                    request,
+                    f'Skipped {len(conflicts)} product{"" if len(conflicts) == 1 else "s"} changed since the preview '
+                    f'({shown}{", ..." if len(conflicts) > self.IMPORT_CONFLICTS_SHOWN else ""}); '
+                    'upload the file again to update them.',
+                    messages.WARNING,
+                )
+            return HttpResponseRedirect(changelist_url)
+
+        if request.method == 'POST' and request.FILES.get('file'):
+            upload = request.FILES['file']
+            try:
+                plan = plan_import(read_sheet(upload.file, upload.name))
+            except ImportFileError as e:
+                context['error'] = str(e)
+                return TemplateResponse(request, 'admin/shop/products/import.html', context)
+            token = uuid.uuid4().hex
+            if plan['changes']:
+                cache.set(f'product_import:{request.user.pk}:{token}', plan, self.IMPORT_PLAN_TIMEOUT)
+            context.update({
+                'plan': plan,
+                'token': token,
+                'filename': upload.name,
+                'preview': plan['changes'][:self.IMPORT_PREVIEW_ROWS],
+                'errors': plan['errors'][:self.IMPORT_PREVIEW_ROWS],
+            })
+        return TemplateResponse(request, 'admin/shop/products/import.html', context)
+
+    def export_products_csv(self, request):
+        """Stream every product as CSV, in the layout the import reads."""
         now = timezone.localtime(timezone.now()).strftime('%Y-%m-%d_%H%M')
-        response['Content-Disposition'] = f'attachment; filename="KONNECT_INC_Products_{now}.pdf"'
-
-        doc = SimpleDocTemplate(
-            response,
-            pagesize=landscape(A4),
-            leftMargin=15 * mm,
-            rightMargin=15 * mm,
-            topMargin=20 * mm,
-            bottomMargin=15 * mm,
-        )
-
-        styles = getSampleStyleSheet()
-        elements = []
-
-        # ── Title ────────────────────────────────────────────
-        title_style = ParagraphStyle(
-            'PDFTitle',
-            parent=styles['Title'],
-            fontSize=20,
-            spaceAfter=4,
-            textColor=colors.HexColor('#002147'),
-        )
-        elements.append(Paragraph('KONNECT INC – Product Catalogue', title_style))
-
-        subtitle_style = ParagraphStyle(
-            'PDFSubtitle',
-            parent=styles['Normal'],
-            fontSize=10,
-            textColor=colors.gray,
-            alignment=TA_CENTER,
-            spaceAfter=16,
-        )
-        generated = timezone.localtime(timezone.now()).strftime('%B %d, %Y  %I:%M %p')
-        elements.append(Paragraph(f'Generated on {generated}', subtitle_style))
-        elements.append(Spacer(1, 6 * mm))
-
-        # ── Styles for table cells ───────────────────────────
-        cell_style = ParagraphStyle('Cell', parent=styles['Normal'], fontSize=8, leading=10)
-        header_style = ParagraphStyle(
-            'Header', parent=styles['Normal'], fontSize=8, leading=10,
-            textColor=colors.white, fontName='Helvetica-Bold',
-        )
-        category_style = ParagraphStyle(
-            'CatHeader', parent=styles['Heading2'],
-            fontSize=12, textColor=colors.HexColor('#002147'),
-            spaceBefore=10, spaceAfter=6,
-        )
+        response = StreamingHttpResponse(export_rows(), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="KONNECT_INC_Products_{now}.csv"'
+        return response
 
-        # ── Build a section per category ─────────────────────
-        categories = Category.objects.prefetch_related('products_set').order_by('name')
-
-        for cat in categories:
-            products = cat.products_set.all().order_by('product_name')
-            if not products.exists():
-                continue
-
-            elements.append(Paragraph(f'{cat.name}', category_style))
-
-            # Table header
-            header_row = [
-                Paragraph('#', header_style),
-                Paragraph('Product Name', header_style),
-                Paragraph('Code', header_style),
-                Paragraph('Retail Price', header_style),
-                Paragraph('Wholesale Price', header_style),
-                Paragraph('Qty/Box', header_style),
-                Paragraph('Box Price', header_style),
-                Paragraph('Retail Stock', header_style),
-                Paragraph('Wholesale Stock', header_style),
-                Paragraph('New?', header_style),
-            ]
-            data = [header_row]
-
-            for idx, p in enumerate(products, start=1):
-                ws_price = p.get_wholesale_price
-                data.append([
-                    Paragraph(str(idx), cell_style),
-                    Paragraph(p.product_name, cell_style),
-                    Paragraph(p.product_code or '—', cell_style),
-                    Paragraph(f'GHS {p.product_price:,.2f}', cell_style),
-                    Paragraph(f'GHS {ws_price:,.2f}', cell_style),
-                    Paragraph(str(p.quantity_per_box), cell_style),
-                    Paragraph(f'GHS {p.box_price:,.2f}', cell_style),
-                    Paragraph(f'{p.product_stock} units', cell_style),
-                    Paragraph(f'{p.wholesale_stock} boxes', cell_style),
-                    Paragraph('Yes' if p.is_new else '', cell_style),
-                ])
-
-            col_widths = [22 * mm, 55 * mm, 25 * mm, 30 * mm, 32 * mm, 20 * mm, 30 * mm, 25 * mm, 30 * mm, 18 * mm]
-
-            table = Table(data, colWidths=col_widths, repeatRows=1)
-            table.setStyle(TableStyle([
-                # Header row
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#002147')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 8),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
-                ('TOPPADDING', (0, 0), (-1, 0), 6),
-                # Body rows
-                ('FONTSIZE', (0, 1), (-1, -1), 8),
-                ('TOPPADDING', (0, 1), (-1, -1), 4),
-                ('BOTTOMPADDING', (0, 1), (-1, -1), 4),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f0f4f8')]),
-                # Grid
-                ('GRID', (0, 0), (-1, -1), 0.4, colors.HexColor('#cccccc')),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('ALIGN', (0, 0), (0, -1), 'CENTER'),
-                ('ALIGN', (3, 0), (6, -1), 'RIGHT'),
-                ('ALIGN', (7, 0), (8, -1), 'CENTER'),
-                ('ALIGN', (9, 0), (9, -1), 'CENTER'),
-            ]))
-
-            elements.append(table)
-            elements.append(Spacer(1, 8 * mm))
-
-        # ── Summary at the end ───────────────────────────────
-        total = Products.objects.count()
-        summary_style = ParagraphStyle(
-            'Summary', parent=styles['Normal'], fontSize=9,
-            textColor=colors.HexColor('#444444'), spaceAfter=4,
+    def download_products_pdf(self, request):
+        """Serve the pre-built catalogue PDF (see shop.catalogue_pdf).
+
+        The newest file on disk is sent straight away; if the products have
+        changed since it was built, a rebuild is started in the background
+        (at most every few minutes) and the admin is told the file is out
+        of date.
+        """
+        current = ensure_current_pdf()
+        path, meta = latest_pdf()
+        if path is None:
+            self.message_user(
+                request,
+                'The product PDF is being generated. Please try again in a minute.',
+                messages.INFO,
+            )
+            return HttpResponseRedirect(reverse('admin:shop_products_changelist'))
+
+        built_at = parse_datetime(meta.get('built_at', '')) if meta else None
+        built_at = timezone.localtime(built_at or timezone.now())
+        if not current:
+            self.message_user(
+                request,
+                f'Products have changed since this PDF was made ({built_at:%d %b %Y %H:%M}), so its prices '
+                'and stock may be out of date; an updated one will be ready in a few minutes.',
+                messages.WARNING,
+            )
+        stamp = built_at.strftime('%Y-%m-%d_%H%M')
+        return FileResponse(
+            open(path, 'rb'),
+            as_attachment=True,
+            filename=f'KONNECT_INC_Products_{stamp}.pdf',
+            content_type='application/pdf',
         )
-        elements.append(Spacer(1, 4 * mm))
-        elements.append(Paragraph(f'<b>Total products:</b> {total}', summary_style))
-
-        doc.build(elements)
-        return response
 
     def image_preview(self, obj):
         """Large preview shown on the edit form."""
         if obj.product_image:
-            url = obj.product_image.url
+            url = obj.media_url('card_2x')
             return format_html(
                 '<img src="{}" style="max-height:300px;max-width:100%;border-radius:8px;box-shadow:0 2px 8px rgba(0,0,0,.15)" />',
                 url
@@ -219,10 +328,9 @@ class ProductsAdmin(admin.ModelAdmin):
     def video_preview(self, obj):
         """Video preview shown on the edit form."""
         if obj.product_video:
-            url = obj.product_video.url
             return format_html(
-                '<video src="{}" controls style="max-height:300px;max-width:100%;border-radius:8px;box-shadow:0 2px 8px rgba(0,0,0,.15)"></video>',
-                url
+                '<video src="{}" poster="{}" controls style="max-height:300px;max-width:100%;border-radius:8px;box-shadow:0 2px 8px rgba(0,0,0,.15)"></video>',
+                obj.media_url('video'), obj.media_url('poster')
             )
         return 'No video uploaded yet'
     video_preview.short_description = 'Video Preview'
@@ -230,7 +338,7 @@ class ProductsAdmin(admin.ModelAdmin):
     def image_thumbnail(self, obj):
         """Small thumbnail shown in the list view."""
         if obj.product_image:
-            url = obj.product_image.url
+            url = obj.media_url('thumb')
             return format_html(
                 '<img src="{}" style="height:40px;width:40px;object-fit:cover;border-radius:4px" />',
                 url
@@ -0,0 +1,157 @@
+"""
+Daily sales rollups and the reports read from them.
+
+``record_paid_order`` adds an order to the day's totals in the same
+transaction that marks it paid, so the rollup tables are always current
+and reports never touch ``Order``/``OrderItem``.  ``rebuild_rollups``
+recomputes them from history (``manage.py rebuild_sales_rollups``) for
+backfills or after orders were changed by hand.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import DailyCategorySales, DailyProductSales, DailySales, OrderItem
+
+
+def _add(model, keys, orders, units, revenue):
+    """Add to the rollup row for ``keys``, creating it if needed."""
+    increments = {
+        'orders': F('orders') + orders,
+        'units': F('units') + units,
+        'revenue': F('revenue') + revenue,
+    }
+    if model.objects.filter(**keys).update(**increments):
+        return
+    try:
+        # Savepoint: a concurrent payment may create the same row first.
+        with transaction.atomic():
+            model.objects.create(**keys, orders=orders, units=units, revenue=revenue)
+    except IntegrityError:
+        model.objects.filter(**keys).update(**increments)
+
+
+def record_paid_order(order, paid_at=None):
+    """Add a newly paid order to the daily rollups."""
+    day = timezone.localdate(paid_at or timezone.now())
+    lines = list(order.items.values_list('product_id', 'product__category_id', 'quantity', 'price'))
+    if not lines:
+        return
+
+    products = defaultdict(lambda: [0, Decimal('0')])
+    categories = defaultdict(lambda: [0, Decimal('0')])
+    for product_id, category_id, quantity, price in lines:
+        for totals in (products[product_id], categories[category_id]):
+            totals[0] += quantity
+            totals[1] += quantity * price
+
+    keys = {'date': day, 'order_type': order.order_type}
+    with transaction.atomic():
+        for product_id, (units, revenue) in products.items():
+            _add(DailyProductSales, {**keys, 'product_id': product_id}, 1, units, revenue)
+        for category_id, (units, revenue) in categories.items():
+            _add(DailyCategorySales, {**keys, 'category_id': category_id}, 1, units, revenue)
+        _add(
+            DailySales, keys, 1,
+            sum(units for units, _ in products.values()),
+            sum(revenue for _, revenue in products.values()),
+        )
+
+
+def _paid_lines(since=None):
+    # Dated by paid_at, the same moment record_paid_order used.  Orders
+    # set to paid by hand in the admin have none; their last edit is the
+    # best guess.
+    lines = OrderItem.objects.filter(order__status='paid').annotate(
+        paid_at=Coalesce('order__paid_at', 'order__updated_at'),
+    )
+    if since is not None:
+        lines = lines.filter(paid_at__date__gte=since)
+    return lines.annotate(
+        date=TruncDate('paid_at', tzinfo=timezone.get_current_timezone()),
+        order_type=F('order__order_type'),
+    )
+
+
+def _aggregate(lines, *group_by):
+    return lines.values('date', 'order_type', *group_by).annotate(
+        orders=Count('order_id', distinct=True),
+        units=Sum('quantity'),
+        revenue=Sum(F('quantity') * F('price')),
+    ).order_by()
+
+
+def rebuild_rollups(since=None, batch_size=1000):
+    """Recompute the rollups from paid orders, from ``since`` (a date) on.
+
+    Returns the number of rows written per table.
+    """
+    written = {}
+    with transaction.atomic():
+        for model, group_by in (
+            (DailySales, ()),
+            (DailyCategorySales, ('product__category_id',)),
+            (DailyProductSales, ('product_id',)),
+        ):
+            existing = model.objects.all()
+            if since is not None:
+                existing = existing.filter(date__gte=since)
+            existing.delete()
+
+            rows = []
+            for row in _aggregate(_paid_lines(since), *group_by).iterator():
+                fields = {k: row[k] for k in ('date', 'order_type', 'orders', 'units', 'revenue')}
+                if 'product__category_id' in row:
+                    fields['category_id'] = row['product__category_id']
+                if 'product_id' in row:
+                    fields['product_id'] = row['product_id']
+                rows.append(model(**fields))
+            model.objects.bulk_create(rows, batch_size=batch_size)
+            written[model.__name__] = len(rows)
+    return written
+
+
+# ── Reports ──────────────────────────────────────────────────
+
+def sales_report(start, end, top=10):
+    """Everything the dashboard shows for ``start``..``end`` (inclusive)."""
+    in_range = {'date__gte': start, 'date__lte': end}
+    sums = {'orders': Sum('orders'), 'units': Sum('units'), 'revenue': Sum('revenue')}
+
+    totals = {
+        row['order_type']: row
+        for row in DailySales.objects.filter(**in_range).values('order_type').annotate(**sums).order_by()
+    }
+    by_day = defaultdict(dict)
+    for row in DailySales.objects.filter(**in_range).values('date', 'order_type', 'orders', 'units', 'revenue'):
+        by_day[row['date']][row['order_type']] = row
+    days = []
+    day = start
+    while day <= end:
+        days.append({'date': day, **{t: by_day[day].get(t) for t in ('retail', 'wholesale')}})
+        day += timedelta(days=1)
+
+    categories = list(
+        DailyCategorySales.objects.filter(**in_range)
+        .values('category__name', 'order_type').annotate(**sums)
+        .order_by('-revenue')
+    )
+    products = list(
+        DailyProductSales.objects.filter(**in_range)
+        .values('product__product_name', 'product__product_code').annotate(**sums)
+        .order_by('-revenue')[:top]
+    )
+    return {
+        'start': start,
+        'end': end,
+        'totals': totals,
+        'days': days,
+        'categories': categories,
+        'top_products': products,
+    }
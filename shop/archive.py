@@ -0,0 +1,102 @@
+"""
+Move closed orders out of the hot ``Order``/``OrderItem`` tables.
+
+``archive_orders`` copies a batch of orders, with their line items, into
+``ArchivedOrder``/``ArchivedOrderItem`` and deletes the originals in one
+transaction, so an order is always in exactly one place.  Ids are kept,
+so references in logs and payment records still resolve.
+
+The copy is idempotent: rows already in the archive (say, left by an
+earlier run) are skipped rather than failing the batch, and an original
+is only deleted once its archived copy is confirmed.  An order whose id,
+or one of whose items' ids, is taken in the archive by a different order
+is logged and left alone, with any partial copy of it removed; callers
+page past it with ``after_id`` so it can't hold up the rest.
+"""
+
+import logging
+
+from django.db import transaction
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+
+logger = logging.getLogger(__name__)
+
+# Paid orders stay by default: the sales rollup rebuild and the order
+# export read them from Order.
+DEFAULT_STATUSES = ('failed', 'cancelled')
+
+ORDER_COLUMNS = [
+    'id', 'order_id', 'email', 'phone', 'full_name', 'address', 'total_amount', 'status',
+    'order_type', 'paystack_reference', 'created_at', 'updated_at', 'paid_at',
+]
+
+
+def archivable_orders(updated_before, statuses=DEFAULT_STATUSES):
+    return Order.objects.filter(status__in=statuses, updated_at__lt=updated_before)
+
+
+def archive_orders(updated_before, statuses=DEFAULT_STATUSES, batch_size=500, after_id=0):
+    """Archive one batch of closed orders last changed before ``updated_before``.
+
+    Only orders with ids above ``after_id`` are looked at.  Returns
+    ``(orders, items, skipped, last_id)``: orders and items moved, orders
+    that couldn't be, and the highest id looked at (pass it back as
+    ``after_id``; None once there is nothing left).  Call repeatedly until
+    fewer than ``batch_size`` orders were looked at.
+    """
+    with transaction.atomic():
+        orders = list(
+            archivable_orders(updated_before, statuses)
+            .filter(id__gt=after_id)
+            .select_for_update(skip_locked=True)
+            .order_by('id')
+            .values(*ORDER_COLUMNS)[:batch_size]
+        )
+        if not orders:
+            return 0, 0, 0, None
+        order_ids = [order['id'] for order in orders]
+        items = list(
+            OrderItem.objects.filter(order_id__in=order_ids)
+            .values('id', 'order_id', 'product_id', 'product__product_name', 'quantity', 'price')
+        )
+
+        ArchivedOrder.objects.bulk_create([ArchivedOrder(**order) for order in orders], ignore_conflicts=True)
+        # Only carry on with orders now in the archive under their own id;
+        # their items mustn't end up under someone else's order.
+        archived = dict(ArchivedOrder.objects.filter(id__in=order_ids).values_list('id', 'order_id'))
+        copied = {order['id'] for order in orders if archived.get(order['id']) == order['order_id']}
+        ours = set(copied)
+        items = [item for item in items if item['order_id'] in copied]
+
+        ArchivedOrderItem.objects.bulk_create([
+            ArchivedOrderItem(
+                id=item['id'],
+                order_id=item['order_id'],
+                product_id=item['product_id'],
+                product_name=item['product__product_name'],
+                quantity=item['quantity'],
+                price=item['price'],
+            )
+            for item in items
+        ], ignore_conflicts=True)
+        archived_items = dict(
+            ArchivedOrderItem.objects.filter(id__in=[item['id'] for item in items]).values_list('id', 'order_id')
+        )
+        copied -= {item['order_id'] for item in items if archived_items.get(item['id']) != item['order_id']}
+        for order in orders:
+            if order['id'] not in copied:
+                logger.warning(
+                    'Could not archive order %s: its id or an item id is already used in the archive',
+                    order['order_id'],
+                )
+        # An order can't stay half-archived: drop the copy of any order
+        # whose items didn't all make it (its items go with it).
+        ArchivedOrder.objects.filter(id__in=ours - copied).delete()
+
+        # Items first, so deleting the orders has nothing left to cascade.
+        OrderItem.objects.filter(order_id__in=copied).delete()
+        Order.objects.filter(id__in=copied).delete()
+    moved_items = sum(1 for item in items if item['order_id'] in copied)
+    return len(copied), moved_items, len(orders) - len(copied), order_ids[-1]
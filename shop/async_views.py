@@ -0,0 +1,132 @@
+"""
+Async versions of the catalog, checkout and webhook views.
+
+Served instead of their shop.views counterparts under the ASGI profile
+(``SERVING_PROFILE=asgi``, see shop.urls and gunicorn.conf.py).  The point
+is checkout: the Paystack calls are awaited on the worker's event loop
+through the shared async client, so a checkout waiting on Paystack holds
+no thread and one small worker can have hundreds in flight.
+
+Database and cache work still runs synchronously, each step handed to a
+thread with ``sync_to_async``; validation and response building are the
+same helpers the sync views use, so both modes answer identically.
+"""
+
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, etag, require_GET, require_POST
+
+from . import paystack
+from .catalog import get_product_page, get_rendered_page
+from .idempotency import idempotent
+from .models import Products
+from .orders import fail_order
+from .views import (
+    _bad_product_ids, _catalog_params, _catalog_response, _parse_checkout, _parse_product_ids,
+    _parse_reference, _parse_webhook, _payment_started, _payment_verified, _paystack_payload,
+    _paystack_unavailable, _products_etag, _products_response, _start_order, _storefront_etag,
+)
+from .webhooks import record_event
+
+
+# ── Catalog ──────────────────────────────────────────────────
+
+@cache_control(no_cache=True)
+@condition(etag_func=_storefront_etag('retail'))
+async def index(request):
+    """Retail shop page."""
+    return HttpResponse(await sync_to_async(get_rendered_page)('retail', 'html/index.html'))
+
+
+@cache_control(no_cache=True)
+@condition(etag_func=_storefront_etag('wholesale'))
+async def wholesale(request):
+    """Wholesale page – bulk purchasing."""
+    return HttpResponse(await sync_to_async(get_rendered_page)('wholesale', 'html/wholesale.html'))
+
+
+async def catalog_api(request):
+    """Keyset-paginated products for one category tab."""
+    params, error = _catalog_params(request)
+    if error:
+        return error
+    return _catalog_response(await sync_to_async(get_product_page)(*params))
+
+
+@require_GET
+@cache_control(no_cache=True)
+@etag(_products_etag)
+async def get_products(request):
+    """Batch product details for refreshing a saved cart (``?ids=1,2,3``)."""
+    ids = _parse_product_ids(request)
+    if ids is None:
+        return _bad_product_ids()
+    return _products_response(ids, await Products.objects.ain_bulk(ids))
+
+
+# ── Checkout ─────────────────────────────────────────────────
+
+@csrf_exempt
+@require_POST
+@idempotent('create_order')
+async def create_order(request):
+    """Create order and initialize Paystack payment"""
+    try:
+        details, error = _parse_checkout(request)
+        if error:
+            return error
+        order, error = await sync_to_async(_start_order)(details)
+        if error:
+            return error
+
+        try:
+            paystack_response = await paystack.ainitialize_transaction(_paystack_payload(order, details))
+        except paystack.PaystackError as e:
+            await sync_to_async(fail_order)(order)
+            return _paystack_unavailable(e)
+
+        return await sync_to_async(_payment_started)(order, paystack_response)
+
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+@csrf_exempt
+@require_POST
+async def verify_payment(request):
+    """Verify Paystack payment"""
+    try:
+        reference, error = _parse_reference(request)
+        if error:
+            return error
+
+        try:
+            paid = await paystack.acharge_succeeded(reference)
+        except paystack.PaystackError as e:
+            return _paystack_unavailable(e)
+
+        return await sync_to_async(_payment_verified)(reference, paid)
+
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+# ── Webhook ──────────────────────────────────────────────────
+
+@csrf_exempt
+@require_POST
+async def paystack_webhook(request):
+    """Receive Paystack webhooks (stored for ``manage.py process_webhooks``)."""
+    data, error = _parse_webhook(request)
+    if error:
+        return error
+    await sync_to_async(record_event)(data, request.body)
+    return JsonResponse({'status': 'ok'})
@@ -0,0 +1,167 @@
+"""
+Versioned catalog snapshots for the storefront.
+
+The retail and wholesale pages only change when staff edit products or
+when checkout moves stock, so we build the category tabs, the rendered
+page shell and each keyset page of products once per *catalog version*
+and keep them in the cache.  Anything that changes the catalog calls
+``bump_catalog_version`` (see ``shop.signals``), which makes every cached
+snapshot unreachable.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.template.loader import render_to_string
+
+from .media import image_srcset
+from .models import Category, Products
+
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+# Which stock column decides whether a product is listed on each page.
+STOCK_FIELDS = {
+    'retail': 'product_stock',
+    'wholesale': 'wholesale_stock',
+}
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+def _new_version():
+    # A fresh clock reading rather than an increment: the cache's incr
+    # isn't atomic (FileBasedCache does get + set), and neither concurrent
+    # bumps nor a re-seed after the key is culled may reuse a version.
+    return time.time_ns()
+
+
+def get_catalog_version():
+    """Return the current catalog version, creating one if the cache is empty."""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        version = _new_version()
+        cache.add(CATALOG_VERSION_KEY, version, None)
+        version = cache.get(CATALOG_VERSION_KEY, version)
+    return version
+
+
+def bump_catalog_version():
+    """Move the catalog to a new version so cached snapshots are rebuilt."""
+    version = _new_version()
+    cache.set(CATALOG_VERSION_KEY, version, None)
+    return version
+
+
+def bump_catalog_version_on_commit():
+    """Bump the version once the current transaction commits.
+
+    Bumping before commit would let a concurrent request rebuild the
+    snapshot from the old rows and store it under the new version.
+    """
+    transaction.on_commit(bump_catalog_version)
+
+
+def _cache_key(version, *parts):
+    # The build id too: snapshots made by the previous deploy's code (and
+    # templates) must not be served by this one.
+    return ':'.join(['catalog', settings.BUILD_ID, str(version), *map(str, parts)])
+
+
+def product_entry(product):
+    """Flatten a product into the compact dict served to the storefront."""
+    return {
+        'id': product.id,
+        'name': product.product_name,
+        'code': product.product_code,
+        'price': product.product_price,
+        'unit_price': product.get_wholesale_price,
+        'per_box': product.quantity_per_box,
+        'box_price': product.box_price,
+        'stock': product.product_stock,
+        'boxes': product.wholesale_stock,
+        'is_new': product.is_new,
+        'image': product.media_url('card'),
+        'srcset': image_srcset(product.media_urls),
+        'thumb': product.media_url('thumb'),
+        'thumb_2x': product.media_url('thumb_2x'),
+        'video': product.media_url('video'),
+        'poster': product.media_url('poster'),
+    }
+
+
+def get_categories(version=None):
+    """Return the cached list of categories shown as storefront tabs."""
+    if version is None:
+        version = get_catalog_version()
+    key = _cache_key(version, 'categories')
+    categories = cache.get(key)
+    if categories is None:
+        categories = list(Category.objects.order_by('id').values('id', 'name'))
+        cache.set(key, categories, settings.CATALOG_CACHE_TIMEOUT)
+    return categories
+
+
+def product_page_queryset(mode, category_id, after, limit):
+    """In-stock products of a category after ``after``, served by the
+    partial ``products_<mode>_cat_idx`` indexes."""
+    stock_field = STOCK_FIELDS[mode]
+    return (
+        Products.objects
+        .filter(category_id=category_id, id__gt=after, **{f'{stock_field}__gt': 0})
+        .order_by('id')[:limit]
+    )
+
+
+def get_product_page(mode, category_id, after=0, limit=DEFAULT_PAGE_SIZE):
+    """Return one keyset page of in-stock products for a category.
+
+    Pages are ordered by id and ``after`` is the last id the client has
+    seen, so each page is a single index range scan however deep the
+    shopper scrolls.  ``next`` is the cursor for the following page, or
+    ``None`` once the category is exhausted.
+    """
+    version = get_catalog_version()
+    key = _cache_key(version, 'page', mode, category_id, after, limit)
+    page = cache.get(key)
+    if page is None:
+        products = list(product_page_queryset(mode, category_id, after, limit + 1))
+        has_more = len(products) > limit
+        products = products[:limit]
+        page = {
+            'products': [product_entry(p) for p in products],
+            'next': products[-1].id if has_more else None,
+        }
+        cache.set(key, page, settings.CATALOG_CACHE_TIMEOUT)
+    return page
+
+
+def get_rendered_page(mode, template_name):
+    """Return the fully rendered storefront page for ``mode``.
+
+    The page is rendered without a request so nothing per-visitor can
+    end up in the shared copy.
+    """
+    version = get_catalog_version()
+    key = _cache_key(version, 'html', mode)
+    html = cache.get(key)
+    if html is None:
+        context = {
+            'mode': mode,
+            'categories': get_categories(version),
+            'paystack_public_key': settings.PAYSTACK_PUBLIC_KEY,
+        }
+        html = render_to_string(template_name, context)
+        cache.set(key, html, settings.CATALOG_CACHE_TIMEOUT)
+    return html
+
+
+def catalog_is_warm(version=None):
+    """True if both storefront pages for the current version are cached."""
+    if version is None:
+        version = get_catalog_version()
+    # has_key rather than get: the pages are tens of KB each.
+    return all(cache.has_key(_cache_key(version, 'html', mode)) for mode in STOCK_FIELDS)
@@ -0,0 +1,308 @@
+"""
+The downloadable product catalogue PDF.
+
+Building the PDF for a few thousand products takes seconds, far too long
+for an admin request, so it is built once per catalog version (see
+``shop.catalog``) off the request path and kept on disk in
+``settings.CATALOGUE_PDF_DIR``.  The admin download serves the newest
+file straight away and, if it is out of date, starts a rebuild in a
+background thread; ``manage.py build_catalogue_pdf`` does the same from
+cron or a deploy hook.
+
+Paid orders move stock, and with it the catalog version, so rebuilds
+started by downloads are spaced at least
+``CATALOGUE_PDF_REBUILD_INTERVAL`` seconds apart; in between, the
+previous file is served and the admin says it is out of date.  One build
+runs at a time per directory, claimed with an ``O_EXCL`` lockfile.
+
+ReportLab is imported inside the build functions: it is the heaviest
+import in the project and only the builder needs it, so web workers
+(which import this module through the admin) don't pay for it at boot.
+"""
+
+import glob
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .catalog import get_catalog_version
+from .models import Products
+
+
+logger = logging.getLogger(__name__)
+
+# Longer than any build should take; the lock is broken after this if
+# a build died without removing it.
+BUILD_LOCK_TIMEOUT = 600
+
+HEADER_ROW = [
+    '#', 'Product Name', 'Code', 'Retail Price', 'Wholesale Price',
+    'Qty/Box', 'Box Price', 'Retail Stock', 'Wholesale Stock', 'New?',
+]
+# Column widths in mm.
+COL_WIDTHS = [22, 55, 25, 30, 32, 20, 30, 25, 30, 18]
+
+
+def _table_style():
+    from reportlab.lib import colors
+    from reportlab.platypus import TableStyle
+
+    return TableStyle([
+        # Header row
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#002147')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 6),
+        ('TOPPADDING', (0, 0), (-1, 0), 6),
+        # Body rows
+        ('FONTSIZE', (0, 1), (-1, -1), 8),
+        ('TOPPADDING', (0, 1), (-1, -1), 4),
+        ('BOTTOMPADDING', (0, 1), (-1, -1), 4),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f0f4f8')]),
+        # Grid
+        ('GRID', (0, 0), (-1, -1), 0.4, colors.HexColor('#cccccc')),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('ALIGN', (0, 0), (0, -1), 'CENTER'),
+        ('ALIGN', (3, 0), (6, -1), 'RIGHT'),
+        ('ALIGN', (7, 0), (8, -1), 'CENTER'),
+        ('ALIGN', (9, 0), (9, -1), 'CENTER'),
+    ])
+
+
+def pdf_path(version):
+    return os.path.join(settings.CATALOGUE_PDF_DIR, f'catalogue-{version}.pdf')
+
+
+def _meta_path(path):
+    return path[:-len('.pdf')] + '.json'
+
+
+def latest_pdf():
+    """Return ``(path, meta)`` for the newest built PDF, or ``(None, None)``."""
+    paths = glob.glob(os.path.join(settings.CATALOGUE_PDF_DIR, 'catalogue-*.pdf'))
+    if not paths:
+        return None, None
+    path = max(paths, key=os.path.getmtime)
+    try:
+        with open(_meta_path(path)) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        meta = {}
+    return path, meta
+
+
+def _styles():
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+
+    styles = getSampleStyleSheet()
+    return {
+        'title': ParagraphStyle(
+            'PDFTitle', parent=styles['Title'], fontSize=20, spaceAfter=4,
+            textColor=colors.HexColor('#002147'),
+        ),
+        'subtitle': ParagraphStyle(
+            'PDFSubtitle', parent=styles['Normal'], fontSize=10, textColor=colors.gray,
+            alignment=TA_CENTER, spaceAfter=16,
+        ),
+        # Only product names can be long enough to need wrapping.
+        'cell': ParagraphStyle('Cell', parent=styles['Normal'], fontSize=8, leading=10),
+        'category': ParagraphStyle(
+            'CatHeader', parent=styles['Heading2'], fontSize=12,
+            textColor=colors.HexColor('#002147'), spaceBefore=10, spaceAfter=6,
+        ),
+        'summary': ParagraphStyle(
+            'Summary', parent=styles['Normal'], fontSize=9,
+            textColor=colors.HexColor('#444444'), spaceAfter=4,
+        ),
+    }
+
+
+def _product_row(idx, p, name_cell):
+    return [
+        str(idx),
+        name_cell,
+        p.product_code or '—',
+        f'GHS {p.product_price:,.2f}',
+        f'GHS {p.get_wholesale_price:,.2f}',
+        str(p.quantity_per_box),
+        f'GHS {p.box_price:,.2f}',
+        f'{p.product_stock} units',
+        f'{p.wholesale_stock} boxes',
+        'Yes' if p.is_new else '',
+    ]
+
+
+def build_catalogue_pdf(path):
+    """Write the catalogue to ``path`` and return build stats.
+
+    All products come from one query ordered by category, grouped in
+    Python; the file is written beside ``path`` and renamed into place so
+    a download never sees half a PDF.
+    """
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.units import mm
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table
+
+    started = time.perf_counter()
+    styles = _styles()
+    col_widths = [width * mm for width in COL_WIDTHS]
+    table_style = _table_style()
+    generated = timezone.localtime(timezone.now()).strftime('%B %d, %Y  %I:%M %p')
+    elements = [
+        Paragraph('KONNECT INC – Product Catalogue', styles['title']),
+        Paragraph(f'Generated on {generated}', styles['subtitle']),
+        Spacer(1, 6 * mm),
+    ]
+
+    products = (
+        Products.objects.select_related('category')
+        .only(
+            'category__name', 'product_name', 'product_code', 'product_price', 'wholesale_price',
+            'quantity_per_box', 'product_stock', 'wholesale_stock', 'is_new',
+        )
+        .order_by('category__name', 'category_id', 'product_name')
+    )
+    total = 0
+    for _, group in itertools.groupby(products.iterator(chunk_size=2000), key=lambda p: p.category_id):
+        rows = [HEADER_ROW]
+        for idx, p in enumerate(group, start=1):
+            if idx == 1:
+                elements.append(Paragraph(escape(p.category.name), styles['category']))
+            rows.append(_product_row(idx, p, Paragraph(escape(p.product_name), styles['cell'])))
+        total += len(rows) - 1
+        table = Table(rows, colWidths=col_widths, repeatRows=1)
+        table.setStyle(table_style)
+        elements.append(table)
+        elements.append(Spacer(1, 8 * mm))
+
+    elements.append(Spacer(1, 4 * mm))
+    elements.append(Paragraph(f'<b>Total products:</b> {total}', styles['summary']))
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    doc = SimpleDocTemplate(
+        tmp_path,
+        pagesize=landscape(A4),
+        leftMargin=15 * mm,
+        rightMargin=15 * mm,
+        topMargin=20 * mm,
+        bottomMargin=15 * mm,
+    )
+    doc.build(elements)
+    os.replace(tmp_path, path)
+
+    stats = {
+        'products': total,
+        'pages': doc.page,
+        'seconds': round(time.perf_counter() - started, 3),
+        'built_at': timezone.now().isoformat(),
+    }
+    with open(_meta_path(path), 'w') as f:
+        json.dump(stats, f)
+    return stats
+
+
+# ── Build lock ───────────────────────────────────────────────
+
+def _lock_path():
+    return os.path.join(settings.CATALOGUE_PDF_DIR, 'build.lock')
+
+
+def _take_lock():
+    """Claim the build for this process; False if another build holds it."""
+    path = _lock_path()
+    os.makedirs(settings.CATALOGUE_PDF_DIR, exist_ok=True)
+    for _ in range(2):
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            pass
+        try:
+            if time.time() - os.path.getmtime(path) < BUILD_LOCK_TIMEOUT:
+                return False
+            # Left by a build that died.  Renaming is atomic, so only one
+            # process gets to break it, then races for a fresh one.
+            stale = f'{path}.{os.getpid()}.stale'
+            os.rename(path, stale)
+            os.remove(stale)
+        except OSError:
+            pass
+    return False
+
+
+def _release_lock():
+    try:
+        os.remove(_lock_path())
+    except OSError:
+        pass
+
+
+def _remove_old_pdfs(keep):
+    for old in glob.glob(os.path.join(settings.CATALOGUE_PDF_DIR, 'catalogue-*')):
+        if old not in (keep, _meta_path(keep)) and not old.endswith('.tmp'):
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+def _build_locked(path):
+    """Build ``path`` while holding the lock, then release it."""
+    try:
+        stats = build_catalogue_pdf(path)
+        _remove_old_pdfs(path)
+        return stats
+    finally:
+        _release_lock()
+
+
+def build_current_pdf():
+    """Build the PDF for the current catalog version unless it exists.
+
+    Returns the stats, or ``None`` if it was already built or another
+    process is building it.
+    """
+    path = pdf_path(get_catalog_version())
+    if os.path.exists(path) or not _take_lock():
+        return None
+    return _build_locked(path)
+
+
+def _build_in_background(path):
+    try:
+        stats = _build_locked(path)
+        logger.info('Built catalogue PDF: %(products)s products, %(pages)s pages in %(seconds)ss', stats)
+    except Exception:
+        logger.exception('Catalogue PDF build failed')
+    finally:
+        close_old_connections()
+
+
+def ensure_current_pdf():
+    """Start a background build if the newest PDF is out of date.
+
+    Returns True if the newest PDF on disk is already current.  No build
+    starts if the last one finished less than
+    ``CATALOGUE_PDF_REBUILD_INTERVAL`` seconds ago or one is running.
+    """
+    path = pdf_path(get_catalog_version())
+    if os.path.exists(path):
+        return True
+    newest, _ = latest_pdf()
+    if newest and time.time() - os.path.getmtime(newest) < settings.CATALOGUE_PDF_REBUILD_INTERVAL:
+        return False
+    if _take_lock():
+        threading.Thread(target=_build_in_background, args=(path,), name='catalogue-pdf', daemon=True).start()
+    return False
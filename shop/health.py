@@ -0,0 +1,130 @@
+"""
+Liveness and readiness probes.
+
+``/health/`` is hit every few minutes by the Render keep-alive pinger and
+health checks.  ``HealthCheckMiddleware`` sits first in ``MIDDLEWARE`` and
+answers it (and ``/ready/``) before sessions, CSRF, auth and the URL
+resolver ever run.  It also answers ahead of ``SECURE_SSL_REDIRECT``, since
+probes from inside Render arrive over plain HTTP.
+
+* Liveness (``/health/``) only proves the process is serving requests.
+* Readiness (``/ready/``) checks that the database answers and the cache
+  works, each within ``settings.HEALTH_CHECK_TIMEOUT``, and reports
+  whether the storefront pages are already cached.  It returns 503 if the
+  database or the cache is down.  A cold catalog is reported, but the
+  app is still ready.
+
+The checks run on a small dedicated thread pool, so a hung database
+costs the probe its timeout rather than a request thread.
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.http import JsonResponse
+
+from .catalog import catalog_is_warm, get_catalog_version
+
+
+logger = logging.getLogger(__name__)
+
+
+LIVENESS_PATH = '/health/'
+READINESS_PATH = '/ready/'
+
+# Enough for a probe or two at once; a stuck check holds one of these
+# until it gives up, not a request thread.
+_checks = ThreadPoolExecutor(max_workers=2, thread_name_prefix='readiness')
+
+
+def _database():
+    # Same housekeeping as the start of a request: drop the connection
+    # if it's past CONN_MAX_AGE or broken, then prove a round trip.
+    close_old_connections()
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+    return {}
+
+
+def _cache():
+    # The catalog version is read on every storefront request, so
+    # reading it is a real round trip through the cache backend.
+    version = get_catalog_version()
+    return {'catalog_version': version, 'catalog_warm': catalog_is_warm(version)}
+
+
+CHECKS = {
+    'database': _database,
+    'cache': _cache,
+}
+
+
+def _timed(check):
+    started = time.perf_counter()
+    result = {'ok': True, **check()}
+    result['ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def _outcome(name, future, deadline):
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except TimeoutError:
+        logger.warning('Readiness check %s timed out', name)
+        return {'ok': False, 'error': 'timed out'}
+    except Exception as e:
+        # The probe is public: log the details, report only the kind.
+        logger.warning('Readiness check %s failed: %s', name, e)
+        return {'ok': False, 'error': type(e).__name__}
+
+
+def liveness_response():
+    return JsonResponse({'status': 'ok'})
+
+
+def readiness_response():
+    deadline = time.monotonic() + settings.HEALTH_CHECK_TIMEOUT
+    # Start every check before waiting on any, so they share the deadline.
+    futures = {name: _checks.submit(_timed, check) for name, check in CHECKS.items()}
+    results = {name: _outcome(name, future, deadline) for name, future in futures.items()}
+    ready = all(result['ok'] for result in results.values())
+    response = JsonResponse(
+        {'status': 'ready' if ready else 'unavailable', 'checks': results},
+        status=200 if ready else 503,
+    )
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+class HealthCheckMiddleware:
+    """Answer the probes before the rest of the middleware stack."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if request.path_info == LIVENESS_PATH:
+            return liveness_response()
+        if request.path_info == READINESS_PATH:
+            return readiness_response()
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.path_info == LIVENESS_PATH:
+            return liveness_response()
+        if request.path_info == READINESS_PATH:
+            return await sync_to_async(readiness_response, thread_sensitive=False)()
+        return await self.get_response(request)
@@ -0,0 +1,243 @@
+"""
+``Idempotency-Key`` support for POST endpoints.
+
+The first request with a key claims it by inserting an ``IdempotencyKey``
+row; the unique ``(scope, key_hash)`` constraint means exactly one
+request wins, across threads and workers alike.  Its successful response
+is stored on the row and in the cache, and replayed for any repeat within
+``settings.IDEMPOTENCY_KEY_TTL`` seconds; a replay served from the cache
+touches neither the database nor Paystack.  A duplicate that arrives
+while the first request is still running waits for its response (up to
+``WAIT_TIMEOUT`` seconds, then a 409 with ``Retry-After``) instead of
+running alongside it.
+
+Only successful responses are stored: a shopper who hit an out-of-stock
+error or a Paystack outage can retry with the same key and get a fresh
+attempt.  Works on sync and async views alike.
+"""
+
+import asyncio
+import functools
+import hashlib
+import time
+from datetime import timedelta
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+
+# How long a claim lasts if its request dies without storing a response;
+# longer than the slowest create_order (Paystack timeouts included).
+LOCK_TIMEOUT = 30
+
+# How long a duplicate waits for the first request, and how often it
+# looks; past that it gets a 409 and is told to retry after RETRY_AFTER.
+WAIT_TIMEOUT = 10
+POLL_INTERVAL = 0.2
+RETRY_AFTER = 2
+
+
+def _cache_key(scope, key_hash):
+    return f'idempotency:{scope}:{key_hash}'
+
+
+def _stored(claim):
+    return {
+        'fingerprint': claim.fingerprint,
+        'status': claim.status,
+        'content': bytes(claim.content),
+        'content_type': claim.content_type,
+    }
+
+
+def _mismatch():
+    return JsonResponse(
+        {'success': False, 'error': 'Idempotency-Key was already used for a different request'},
+        status=422,
+    )
+
+
+def _replay(stored, fingerprint):
+    if stored['fingerprint'] != fingerprint:
+        return _mismatch()
+    response = HttpResponse(stored['content'], status=stored['status'], content_type=stored['content_type'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _check_key(request):
+    """Return the request's key and an error response if it's unusable."""
+    key = request.META.get(HEADER, '').strip()
+    if len(key) > MAX_KEY_LENGTH:
+        return key, JsonResponse({'success': False, 'error': 'Idempotency-Key is too long'}, status=400)
+    return key, None
+
+
+def _in_progress():
+    response = JsonResponse(
+        {'success': False, 'error': 'A request with this Idempotency-Key is still in progress'},
+        status=409,
+    )
+    response['Retry-After'] = str(RETRY_AFTER)
+    return response
+
+
+def _expired(claim, now):
+    timeout = LOCK_TIMEOUT if claim.status is None else settings.IDEMPOTENCY_KEY_TTL
+    return claim.claimed_at < now - timedelta(seconds=timeout)
+
+
+def _claim(scope, key_hash, fingerprint):
+    """Try once to claim a key for this request.
+
+    Returns ``(claim, None)`` if the view should run, ``(None, response)``
+    with a replay or a 422, or ``(None, None)`` while another request
+    holds the key.
+    """
+    now = timezone.now()
+    try:
+        # Savepoint, so a lost race doesn't break an enclosing transaction.
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(
+                scope=scope, key_hash=key_hash, fingerprint=fingerprint, claimed_at=now,
+            ), None
+    except IntegrityError:
+        pass
+
+    existing = IdempotencyKey.objects.filter(scope=scope, key_hash=key_hash).first()
+    if existing is None:
+        # The first request failed and let go a moment ago; try again.
+        return None, None
+    if _expired(existing, now):
+        # A claim whose request died, or a response past its TTL: take it
+        # over, unless another request just did.
+        taken = IdempotencyKey.objects.filter(pk=existing.pk, claimed_at=existing.claimed_at).update(
+            fingerprint=fingerprint, claimed_at=now, status=None, content=None, content_type='',
+        )
+        if not taken:
+            return None, None
+        existing.fingerprint, existing.claimed_at, existing.status = fingerprint, now, None
+        return existing, None
+    if existing.status is None:
+        # Still running: wait for it, unless this is a different request.
+        return None, (_mismatch() if existing.fingerprint != fingerprint else None)
+    stored = _stored(existing)
+    cache.set(_cache_key(scope, key_hash), stored, settings.IDEMPOTENCY_KEY_TTL)
+    return None, _replay(stored, fingerprint)
+
+
+def _begin(scope, request):
+    """Check the request's key and look for a stored response.
+
+    Returns ``(attempt, None)`` where ``attempt()`` claims the key (see
+    ``_claim``), ``(None, response)`` to answer without running the view,
+    or ``(None, None)`` for a request without a key.
+    """
+    key, error = _check_key(request)
+    if error:
+        return None, error
+    if not key:
+        return None, None
+    key_hash = hashlib.sha256(key.encode()).hexdigest()
+    fingerprint = hashlib.sha256(request.body).hexdigest()
+    stored = cache.get(_cache_key(scope, key_hash))
+    if stored is not None:
+        return None, _replay(stored, fingerprint)
+    return functools.partial(_claim, scope, key_hash, fingerprint), None
+
+
+def _finish(claim, response):
+    """Keep a successful response for replay; give the key up otherwise
+    (``response`` is None if the view raised)."""
+    # Filtering on claimed_at leaves alone a key another request has
+    # taken over since.
+    mine = IdempotencyKey.objects.filter(pk=claim.pk, claimed_at=claim.claimed_at)
+    if response is not None and 200 <= response.status_code < 300 and not response.streaming:
+        claim.status, claim.content, claim.content_type = (
+            response.status_code, response.content, response.get('Content-Type'),
+        )
+        if mine.update(status=claim.status, content=claim.content, content_type=claim.content_type):
+            cache.set(_cache_key(claim.scope, claim.key_hash), _stored(claim), settings.IDEMPOTENCY_KEY_TTL)
+    else:
+        mine.delete()
+
+
+def purge_expired_keys(now=None):
+    """Delete keys past ``IDEMPOTENCY_KEY_TTL``; returns how many."""
+    now = now or timezone.now()
+    cutoff = now - timedelta(seconds=max(settings.IDEMPOTENCY_KEY_TTL, LOCK_TIMEOUT))
+    deleted, _ = IdempotencyKey.objects.filter(claimed_at__lt=cutoff).delete()
+    return deleted
+
+
+def idempotent(scope):
+    """Make a view replay its first successful response per Idempotency-Key.
+
+    Requests without the header run as before.  The async wrapper runs
+    the same helpers through ``sync_to_async``.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @functools.wraps(view_func)
+            async def wrapper(request, *args, **kwargs):
+                attempt, response = await sync_to_async(_begin)(scope, request)
+                if response is not None:
+                    return response
+                if attempt is None:
+                    return await view_func(request, *args, **kwargs)
+
+                deadline = time.monotonic() + WAIT_TIMEOUT
+                while True:
+                    claim, response = await sync_to_async(attempt)()
+                    if response is not None:
+                        return response
+                    if claim is not None:
+                        break
+                    if time.monotonic() >= deadline:
+                        return _in_progress()
+                    await asyncio.sleep(POLL_INTERVAL)
+
+                try:
+                    response = await view_func(request, *args, **kwargs)
+                    return response
+                finally:
+                    await sync_to_async(_finish)(claim, response)
+
+            return wrapper
+
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            attempt, response = _begin(scope, request)
+            if response is not None:
+                return response
+            if attempt is None:
+                return view_func(request, *args, **kwargs)
+
+            deadline = time.monotonic() + WAIT_TIMEOUT
+            while True:
+                claim, response = attempt()
+                if response is not None:
+                    return response
+                if claim is not None:
+                    break
+                if time.monotonic() >= deadline:
+                    return _in_progress()
+                time.sleep(POLL_INTERVAL)
+
+            try:
+                response = view_func(request, *args, **kwargs)
+                return response
+            finally:
+                _finish(claim, response)
+        return wrapper
+    return decorator
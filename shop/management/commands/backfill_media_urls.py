@@ -0,0 +1,56 @@
+"""
+Fill in ``Products.media_urls`` for rows that don't have them yet.
+
+    python manage.py backfill_media_urls
+    python manage.py backfill_media_urls --all     # after changing shop.media variants
+
+Products saved before ``media_urls`` existed (or while Cloudinary wasn't
+configured) have an empty dict, and the storefront falls back to the
+untransformed original for them.  Run from build.sh on every deploy;
+it is a no-op once every row is filled in.
+"""
+
+import cloudinary
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from shop.catalog import bump_catalog_version_on_commit
+from shop.media import build_media_urls
+from shop.models import Products
+
+
+class Command(BaseCommand):
+    help = 'Build the stored Cloudinary variant URLs for products that lack them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Rebuild every product, not just empty ones.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Products updated per query.')
+
+    def handle(self, *args, **options):
+        if not cloudinary.config().cloud_name:
+            # Nothing can be built; don't fail the deploy over it.
+            self.stdout.write(self.style.WARNING('Cloudinary is not configured; skipping.'))
+            return
+
+        products = Products.objects.order_by('id').only('id', 'product_image', 'product_video')
+        if not options['all']:
+            products = products.filter(media_urls={})
+
+        batch_size = options['batch_size']
+        updated = 0
+        after = 0
+        while True:
+            # Keyset batches: filling a row in drops it from the filter.
+            batch = list(products.filter(id__gt=after)[:batch_size])
+            if not batch:
+                break
+            for product in batch:
+                product.media_urls = build_media_urls(product)
+            with transaction.atomic():
+                Products.objects.bulk_update(batch, ['media_urls'])
+                bump_catalog_version_on_commit()
+            updated += len(batch)
+            after = batch[-1].id
+            self.stdout.write(f'  {updated} products so far')
+
+        self.stdout.write(self.style.SUCCESS(f'Filled in media URLs for {updated} products.'))
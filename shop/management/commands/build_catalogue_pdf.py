@@ -0,0 +1,27 @@
+"""
+Build the product catalogue PDF if the products have changed.
+
+    python manage.py build_catalogue_pdf
+
+Does nothing if the newest PDF is current or another build is running;
+run it from cron or after an import so the admin download is ready
+before anyone asks for it.
+"""
+
+from django.core.management.base import BaseCommand
+
+from shop.catalogue_pdf import build_current_pdf, latest_pdf
+
+
+class Command(BaseCommand):
+    help = 'Build the product catalogue PDF if the catalog has changed.'
+
+    def handle(self, *args, **options):
+        stats = build_current_pdf()
+        if stats is None:
+            path, _ = latest_pdf()
+            self.stdout.write(f'Catalogue PDF is up to date or being built ({path or "none on disk yet"}).')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Built catalogue PDF: {stats['products']} products, {stats['pages']} pages in {stats['seconds']:.2f}s"
+        ))
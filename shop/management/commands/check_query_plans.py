@@ -0,0 +1,80 @@
+"""
+Run EXPLAIN on the hot storefront queries and fail if any would scan the
+whole products table.
+
+    python manage.py check_query_plans
+
+PostgreSQL picks a sequential scan whenever the table is small, so the
+plans are taken with ``enable_seqscan = off``: a query that still plans
+a ``Seq Scan`` has no index that can serve it, however big the catalog
+gets.  On SQLite any ``SCAN shop_products`` (rather than ``SEARCH``)
+is a full table or full index scan.
+"""
+
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from shop.catalog import DEFAULT_PAGE_SIZE, product_page_queryset
+from shop.models import Category, Products
+
+
+TABLE = Products._meta.db_table
+
+
+def storefront_queries(category_id, product_id):
+    """The queries behind the storefront views, keyed by a readable name."""
+    return {
+        'retail catalog page': product_page_queryset('retail', category_id, 0, DEFAULT_PAGE_SIZE + 1),
+        'retail catalog page (deep cursor)': product_page_queryset('retail', category_id, product_id, DEFAULT_PAGE_SIZE + 1),
+        'wholesale catalog page': product_page_queryset('wholesale', category_id, 0, DEFAULT_PAGE_SIZE + 1),
+        'product lookup': Products.objects.filter(id=product_id),
+        'batch product lookup': Products.objects.filter(id__in=[product_id, product_id + 1]),
+        'category listing by name': Products.objects.filter(category_id=category_id).order_by('product_name'),
+    }
+
+
+def full_scans(plan):
+    """Return the plan lines that scan the whole products table."""
+    if connection.vendor == 'postgresql':
+        pattern = rf'Seq Scan on {TABLE}\b'
+    else:
+        pattern = rf'\bSCAN {TABLE}\b'
+    return [line.strip() for line in plan.splitlines() if re.search(pattern, line)]
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the storefront queries and fail if any does a full products scan.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan, not just failures.')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            self.stdout.write(self.style.WARNING(f'No plan check for {connection.vendor}; skipping.'))
+            return
+
+        category_id = Category.objects.values_list('id', flat=True).first() or 1
+        product_id = Products.objects.values_list('id', flat=True).first() or 1
+
+        failures = []
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            for name, queryset in storefront_queries(category_id, product_id).items():
+                plan = queryset.explain()
+                scans = full_scans(plan)
+                if scans:
+                    failures.append(name)
+                    self.stdout.write(self.style.ERROR(f'FAIL  {name}'))
+                    for line in scans:
+                        self.stdout.write(f'        {line}')
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'ok    {name}'))
+                if options['verbose_plans']:
+                    self.stdout.write('        ' + plan.replace('\n', '\n        '))
+
+        if failures:
+            raise CommandError(f'{len(failures)} storefront quer{"y" if len(failures) == 1 else "ies"} would scan {TABLE}: {", ".join(failures)}')
@@ -0,0 +1,48 @@
+"""
+Export orders with their line items for accounting.
+
+    python manage.py export_orders --status paid --start 2025-01-01 --end 2025-01-31 > jan.csv
+    python manage.py export_orders --format ndjson --output jan.ndjson
+
+Streams in constant memory whatever the range (see shop.order_export).
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.models import Order
+from shop.order_export import CHUNK_SIZE, FORMATS, export_orders, filter_orders
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'{value!r} is not a date like 2025-01-31')
+
+
+class Command(BaseCommand):
+    help = 'Stream orders and their line items as CSV or NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--status', choices=[choice for choice, _ in Order.STATUS_CHOICES])
+        parser.add_argument('--start', help='First day (YYYY-MM-DD), by order date.')
+        parser.add_argument('--end', help='Last day (YYYY-MM-DD), inclusive.')
+        parser.add_argument('--format', choices=list(FORMATS), default='csv')
+        parser.add_argument('--output', help='File to write (default: stdout).')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        queryset = filter_orders(
+            status=options['status'],
+            start=_date(options['start']) if options['start'] else None,
+            end=_date(options['end']) if options['end'] else None,
+        )
+        lines = export_orders(queryset, options['format'], options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as f:
+                f.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
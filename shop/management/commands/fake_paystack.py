@@ -0,0 +1,211 @@
+"""
+A local stand-in for the Paystack API, for load testing checkout.
+
+    python manage.py fake_paystack --webhook-url http://127.0.0.1:8000/api/paystack-webhook/
+    PAYSTACK_FAKE=True gunicorn KONNECT_INC.wsgi   # app now talks to the fake
+
+Implements the calls the shop makes:
+
+* ``POST /transaction/initialize`` - records the transaction.
+* ``GET /transaction/verify/<reference>`` - every initialized transaction
+  counts as paid.
+* ``POST /_fake/charge/<reference>`` - not part of Paystack: sends the
+  ``charge.success`` webhook for the transaction to ``--webhook-url``,
+  signed with ``PAYSTACK_SECRET_KEY`` the way Paystack signs it, and
+  returns the webhook's status.  The load test uses this to play the
+  customer finishing payment.
+
+``--latency-ms``/``--jitter-ms`` delay every API response and
+``--error-rate`` makes that share of them fail with a 503.
+"""
+
+import hashlib
+import hmac
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+VERIFY_PATH = re.compile(r'^/transaction/verify/(?P<reference>[^/?]+)$')
+CHARGE_PATH = re.compile(r'^/_fake/charge/(?P<reference>[^/?]+)$')
+
+
+class FakePaystack:
+    """Transactions and behaviour shared by the request handler threads."""
+
+    def __init__(self, secret_key, webhook_url, latency, jitter, error_rate):
+        self.secret_key = secret_key
+        self.webhook_url = webhook_url
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.transactions = {}
+        self.lock = threading.Lock()
+        self.webhooks = requests.Session()
+
+    def delay(self):
+        time.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+
+    def should_fail(self):
+        return random.random() < self.error_rate
+
+    def initialize(self, payload):
+        reference = str(payload.get('reference') or uuid.uuid4())
+        with self.lock:
+            if reference in self.transactions:
+                return 400, {'status': False, 'message': 'Duplicate Transaction Reference'}
+            self.transactions[reference] = {
+                'id': len(self.transactions) + 1,
+                'reference': reference,
+                'amount': payload.get('amount'),
+                'email': payload.get('email'),
+                'metadata': payload.get('metadata'),
+            }
+        return 200, {
+            'status': True,
+            'message': 'Authorization URL created',
+            'data': {
+                'authorization_url': f'https://checkout.paystack.test/{reference}',
+                'access_code': uuid.uuid4().hex[:15],
+                'reference': reference,
+            },
+        }
+
+    def verify(self, reference):
+        transaction = self.transactions.get(reference)
+        if transaction is None:
+            return 404, {'status': False, 'message': 'Transaction reference not found'}
+        return 200, {
+            'status': True,
+            'message': 'Verification successful',
+            'data': {**transaction, 'status': 'success', 'currency': 'GHS'},
+        }
+
+    def charge(self, reference):
+        transaction = self.transactions.get(reference)
+        if transaction is None:
+            return 404, {'status': False, 'message': 'Transaction reference not found'}
+        if not self.webhook_url:
+            return 400, {'status': False, 'message': 'Start fake_paystack with --webhook-url'}
+        body = json.dumps({
+            'event': 'charge.success',
+            'data': {**transaction, 'status': 'success', 'currency': 'GHS'},
+        }).encode()
+        signature = hmac.new(self.secret_key.encode(), body, hashlib.sha512).hexdigest()
+        started = time.perf_counter()
+        response = self.webhooks.post(self.webhook_url, data=body, timeout=30, headers={
+            'Content-Type': 'application/json',
+            'X-Paystack-Signature': signature,
+            # The app redirects plain HTTP to HTTPS unless a proxy says
+            # the request was already secure.
+            'X-Forwarded-Proto': 'https',
+        })
+        return 200, {
+            'status': True,
+            'webhook_status': response.status_code,
+            'webhook_seconds': time.perf_counter() - started,
+        }
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'FakePaystack/1.0'
+
+    @property
+    def fake(self):
+        return self.server.fake
+
+    def send_json(self, status, body):
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def authorized(self):
+        if self.headers.get('Authorization') != f'Bearer {self.fake.secret_key}':
+            self.send_json(401, {'status': False, 'message': 'Invalid key'})
+            return False
+        return True
+
+    def api_call(self, handler, *args):
+        self.fake.delay()
+        if self.fake.should_fail():
+            self.send_json(503, {'status': False, 'message': 'Simulated outage'})
+            return
+        self.send_json(*handler(*args))
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        match = CHARGE_PATH.match(self.path)
+        if match:
+            self.send_json(*self.fake.charge(match['reference']))
+        elif self.path == '/transaction/initialize':
+            if not self.authorized():
+                return
+            try:
+                payload = json.loads(body or b'{}')
+            except ValueError:
+                self.send_json(400, {'status': False, 'message': 'Invalid JSON'})
+                return
+            self.api_call(self.fake.initialize, payload)
+        else:
+            self.send_json(404, {'status': False, 'message': 'Not found'})
+
+    def do_GET(self):
+        match = VERIFY_PATH.match(self.path)
+        if not match:
+            self.send_json(404, {'status': False, 'message': 'Not found'})
+        elif self.authorized():
+            self.api_call(self.fake.verify, match['reference'])
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class Command(BaseCommand):
+    help = 'Run a local fake of the Paystack API for load testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--address', default=settings.PAYSTACK_FAKE_ADDRESS, help='host:port to listen on.')
+        parser.add_argument('--webhook-url', default='', help="The shop's webhook URL, for /_fake/charge/.")
+        parser.add_argument('--latency-ms', type=float, default=150.0, help='Mean API response delay.')
+        parser.add_argument('--jitter-ms', type=float, default=50.0, help='Standard deviation of the delay.')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Share of API calls answered with a 503 (0-1).')
+        parser.add_argument('--verbose-requests', action='store_true', help='Log every request.')
+
+    def handle(self, *args, **options):
+        if settings.PAYSTACK_SECRET_KEY.startswith('sk_live_'):
+            raise CommandError('Refusing to run with a live Paystack secret key.')
+        host, _, port = options['address'].rpartition(':')
+        if not port.isdigit():
+            raise CommandError('--address must look like host:port')
+
+        server = ThreadingHTTPServer((host or '127.0.0.1', int(port)), Handler)
+        server.daemon_threads = True
+        server.verbose = options['verbose_requests']
+        server.fake = FakePaystack(
+            secret_key=settings.PAYSTACK_SECRET_KEY,
+            webhook_url=options['webhook_url'],
+            latency=options['latency_ms'] / 1000,
+            jitter=options['jitter_ms'] / 1000,
+            error_rate=options['error_rate'],
+        )
+        self.stdout.write(f"Fake Paystack listening on http://{options['address']}/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
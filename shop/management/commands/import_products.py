@@ -0,0 +1,48 @@
+"""
+Bulk-update product prices, stock and box sizes from a CSV or XLSX file.
+
+    python manage.py import_products stocktake.xlsx           # dry run
+    python manage.py import_products stocktake.xlsx --apply
+
+Same rules as the admin import (see shop.product_io).
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.product_io import ImportFileError, apply_plan, plan_import, read_sheet
+
+
+class Command(BaseCommand):
+    help = 'Update product prices/stock/box sizes from a CSV or XLSX keyed by product_code.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--apply', action='store_true', help='Write the changes (default is a dry run).')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            with open(options['path'], 'rb') as f:
+                plan = plan_import(read_sheet(f, options['path']))
+        except (OSError, ImportFileError) as e:
+            raise CommandError(str(e))
+
+        for number, code, message in plan['errors']:
+            self.stdout.write(self.style.WARNING(f'row {number} {code}: {message}'))
+        self.stdout.write(
+            f"{len(plan['changes'])} to change, {plan['unchanged']} unchanged, "
+            f"{len(plan['errors'])} skipped ({time.perf_counter() - started:.1f}s)"
+        )
+        if not options['apply']:
+            self.stdout.write('Dry run; pass --apply to write the changes.')
+            return
+
+        started = time.perf_counter()
+        updated, conflicts = apply_plan(plan)
+        for code, reason in conflicts:
+            self.stdout.write(self.style.WARNING(f'{code}: skipped, {reason}'))
+        self.stdout.write(self.style.SUCCESS(f'Updated {updated} products in {time.perf_counter() - started:.1f}s.'))
+        if conflicts:
+            self.stdout.write(f'{len(conflicts)} changed since the preview; run the import again to update them.')
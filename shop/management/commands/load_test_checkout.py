@@ -0,0 +1,189 @@
+"""
+Drive concurrent carts through checkout and check stock stayed consistent.
+
+    PAYSTACK_FAKE=True gunicorn KONNECT_INC.wsgi -b 127.0.0.1:8000 &
+    python manage.py fake_paystack --webhook-url http://127.0.0.1:8000/api/paystack-webhook/ &
+    python manage.py load_test_checkout --base-url http://127.0.0.1:8000 --carts 500 --concurrency 32
+
+Each cart runs create-order -> verify-payment -> charge.success webhook
+(sent by the fake).  Carts are drawn from a small set of products so
+they contend for the same stock rows.  Afterwards the webhook inbox is
+drained and every product's stock is compared with what the paid orders
+took:
+
+* lost updates - stock moved by a different amount than the orders say;
+* oversold - units paid for beyond the stock the product started with.
+
+Points at whatever database this process is configured for, which must
+be the one the server under test uses.  Don't run it against production.
+"""
+
+import random
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q, Sum
+
+from shop.models import Order, OrderItem, Products
+from shop.webhooks import process_pending_events
+
+
+STEPS = ('create', 'verify', 'webhook')
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Command(BaseCommand):
+    help = 'Load-test checkout (create -> verify -> webhook) against a running server.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='The shop under test.')
+        parser.add_argument('--fake-url', default='', help='The fake Paystack (default: PAYSTACK_API_URL).')
+        parser.add_argument('--carts', type=int, default=200, help='Checkouts to run.')
+        parser.add_argument('--concurrency', type=int, default=16, help='Checkouts in flight at once.')
+        parser.add_argument('--products', type=int, default=5, help='How many in-stock products the carts share.')
+        parser.add_argument('--max-items', type=int, default=3, help='Most distinct products in one cart.')
+        parser.add_argument('--max-quantity', type=int, default=2, help='Most units of one product in a cart.')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed, for repeatable carts.')
+
+    def handle(self, *args, **options):
+        fake_url = (options['fake_url'] or settings.PAYSTACK_API_URL).rstrip('/')
+        if 'api.paystack.co' in fake_url:
+            raise CommandError('Point the app at the fake (PAYSTACK_FAKE=True) or pass --fake-url.')
+        base_url = options['base_url'].rstrip('/')
+        rng = random.Random(options['seed'])
+
+        products = list(
+            Products.objects.filter(product_stock__gt=0).order_by('-product_stock')
+            .values_list('id', 'product_stock')[:options['products']]
+        )
+        if not products:
+            raise CommandError('No in-stock products to buy.')
+        initial_stock = dict(products)
+        product_ids = list(initial_stock)
+
+        carts = []
+        for _ in range(options['carts']):
+            chosen = rng.sample(product_ids, rng.randint(1, min(options['max_items'], len(product_ids))))
+            carts.append([{'id': pk, 'quantity': rng.randint(1, options['max_quantity'])} for pk in chosen])
+
+        local = threading.local()
+        latencies = defaultdict(list)
+        errors = Counter()
+        order_ids = []
+        lock = threading.Lock()
+
+        def session():
+            if not hasattr(local, 'session'):
+                local.session = requests.Session()
+                # Look like traffic from the HTTPS proxy so SSL redirect
+                # doesn't bounce us.
+                local.session.headers['X-Forwarded-Proto'] = 'https'
+            return local.session
+
+        def timed(step, method, url, **kwargs):
+            started = time.perf_counter()
+            try:
+                response = session().request(method, url, timeout=60, **kwargs)
+            except requests.RequestException as e:
+                with lock:
+                    errors[f'{step}: {type(e).__name__}'] += 1
+                return None
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies[step].append(elapsed)
+                if response.status_code != 200:
+                    errors[f'{step}: HTTP {response.status_code}'] += 1
+            return response if response.status_code == 200 else None
+
+        def checkout(cart):
+            started = time.perf_counter()
+            response = timed('create', 'POST', f'{base_url}/api/create-order/', json={
+                'cart': cart,
+                'email': 'loadtest@example.com',
+                'full_name': 'Load Test',
+                'phone': '0200000000',
+                'address': 'Load test',
+            }, headers={'Idempotency-Key': str(uuid.uuid4())})
+            if response is None:
+                return
+            reference = response.json()['reference']
+            with lock:
+                order_ids.append(response.json()['order_id'])
+            if timed('verify', 'POST', f'{base_url}/api/verify-payment/', json={'reference': reference}) is None:
+                return
+            charged = timed('webhook', 'POST', f'{fake_url}/_fake/charge/{reference}')
+            if charged is not None and charged.json().get('webhook_status') != 200:
+                with lock:
+                    errors[f"webhook: HTTP {charged.json().get('webhook_status')}"] += 1
+                return
+            with lock:
+                latencies['checkout'].append(time.perf_counter() - started)
+
+        self.stdout.write(f"Running {len(carts)} checkouts, {options['concurrency']} at a time, over {len(product_ids)} products...")
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            list(pool.map(checkout, carts))
+        elapsed = time.perf_counter() - started
+
+        # Apply the webhooks the server stored, so stock is final.
+        while sum(process_pending_events(500)) == 500:
+            pass
+
+        self.report_latency(len(carts), elapsed, latencies, errors)
+        self.report_consistency(initial_stock, order_ids)
+
+    def report_latency(self, carts, elapsed, latencies, errors):
+        completed = len(latencies['checkout'])
+        self.stdout.write('')
+        self.stdout.write(f'Completed {completed}/{carts} checkouts in {elapsed:.1f}s ({completed / elapsed:.1f} checkouts/s)')
+        self.stdout.write(f"{'step':<10}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for step in (*STEPS, 'checkout'):
+            ordered = sorted(latencies[step])
+            if not ordered:
+                continue
+            self.stdout.write(
+                f'{step:<10}{len(ordered):>7}'
+                + ''.join(f'{percentile(ordered, f) * 1000:>10.0f}' for f in (0.50, 0.95, 0.99))
+                + f'{ordered[-1] * 1000:>10.0f}'
+            )
+        if errors:
+            self.stdout.write(self.style.WARNING('Errors:'))
+            for error, count in errors.most_common():
+                self.stdout.write(f'  {count:>6}  {error}')
+
+    def report_consistency(self, initial_stock, order_ids):
+        # Stock counts as taken once an order is paid or, in reservation
+        # mode, while it still holds a reservation.
+        holding = Q(order__status='paid') | Q(order__stock_reserved_until__isnull=False)
+        taken = dict(
+            OrderItem.objects.filter(holding, order__order_id__in=order_ids, product_id__in=initial_stock)
+            .values_list('product_id').annotate(total=Sum('quantity'))
+        )
+        final_stock = dict(Products.objects.filter(id__in=initial_stock).values_list('id', 'product_stock'))
+        paid = Order.objects.filter(order_id__in=order_ids, status='paid').count()
+
+        lost_updates = oversold = 0
+        self.stdout.write('')
+        self.stdout.write(f'{len(order_ids)} orders created, {paid} paid')
+        self.stdout.write(f"{'product':>8}{'before':>8}{'taken':>8}{'after':>8}{'expected':>10}")
+        for pk, before in initial_stock.items():
+            expected = before - taken.get(pk, 0)
+            after = final_stock.get(pk)
+            self.stdout.write(f'{pk:>8}{before:>8}{taken.get(pk, 0):>8}{after:>8}{expected:>10}')
+            if after != max(expected, 0):
+                lost_updates += 1
+            oversold += max(0, taken.get(pk, 0) - before)
+
+        style = self.style.SUCCESS if not (lost_updates or oversold) else self.style.ERROR
+        self.stdout.write(style(f'lost updates: {lost_updates} product(s); oversold: {oversold} unit(s)'))
@@ -0,0 +1,52 @@
+"""
+Drain the Paystack webhook inbox.
+
+    python manage.py process_webhooks            # run until stopped
+    python manage.py process_webhooks --once     # drain what's there, then exit
+    python manage.py process_webhooks --stats    # just report the queue
+
+Each batch reports how many events were applied, the remaining queue
+depth and the lag (age of the oldest unprocessed event).
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from shop.webhooks import inbox_stats, process_pending_events
+
+
+class Command(BaseCommand):
+    help = 'Apply stored Paystack webhook events in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Events applied per transaction.')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when the inbox is empty.')
+        parser.add_argument('--once', action='store_true', help='Exit once the inbox is empty.')
+        parser.add_argument('--stats', action='store_true', help='Print queue depth and lag, then exit.')
+
+    def report(self, processed=None, failed=None):
+        stats = inbox_stats()
+        line = f"pending={stats['pending']} dead={stats['dead']} lag={stats['lag_seconds']:.1f}s"
+        if processed is not None:
+            line = f'processed={processed} failed={failed} ' + line
+        self.stdout.write(line)
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.report()
+            return
+
+        batch_size = options['batch_size']
+        try:
+            while True:
+                processed, failed = process_pending_events(batch_size)
+                if processed or failed:
+                    self.report(processed, failed)
+                if processed + failed < batch_size:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+        self.report()
@@ -0,0 +1,35 @@
+"""
+Rebuild the daily sales rollups from paid orders.
+
+    python manage.py rebuild_sales_rollups                    # everything
+    python manage.py rebuild_sales_rollups --since 2025-01-01
+
+Payments keep the rollups current on their own; run this once to
+backfill history, or after orders were edited by hand in the admin.
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shop.analytics import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily sales rollup tables from paid orders.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Only rebuild from this date (YYYY-MM-DD) on.')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be a date like 2025-01-31')
+
+        written = rebuild_rollups(since)
+        self.stdout.write(self.style.SUCCESS(
+            'Rebuilt sales rollups: ' + ', '.join(f'{name} {count} rows' for name, count in written.items())
+        ))
@@ -0,0 +1,72 @@
+"""
+Settle pending orders whose payment result never reached the shop.
+
+    python manage.py reconcile_payments --dry-run
+    python manage.py reconcile_payments --older-than-minutes 30 --workers 10
+
+Asks Paystack about every pending order older than --older-than-minutes
+(and younger than PENDING_ORDER_MAX_AGE_HOURS, after which sweep_orders
+cancels it), in parallel, and marks each paid or failed as Paystack says
+(see shop.reconcile).  Meant for a cron job every few minutes, and for
+catching up after a webhook outage.
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from shop.reconcile import BATCH_SIZE, pending_orders, reconcile_pending_orders
+
+
+class Command(BaseCommand):
+    help = 'Verify old pending orders against Paystack and settle them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-minutes', type=int, default=15,
+                            help='Leave orders younger than this to the webhook and the customer.')
+        parser.add_argument('--max-age-hours', type=int, default=settings.PENDING_ORDER_MAX_AGE_HOURS,
+                            help='Skip orders older than this.')
+        parser.add_argument('--workers', type=int, default=settings.PAYSTACK_POOL_SIZE,
+                            help='Concurrent Paystack calls (at most PAYSTACK_POOL_SIZE).')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Check Paystack but change nothing.')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if not 1 <= workers <= settings.PAYSTACK_POOL_SIZE:
+            # More threads than pooled connections just opens (and throws
+            # away) extra connections.
+            raise CommandError(f'--workers must be between 1 and PAYSTACK_POOL_SIZE ({settings.PAYSTACK_POOL_SIZE}).')
+
+        now = timezone.now()
+        orders = pending_orders(
+            created_before=now - timedelta(minutes=options['older_than_minutes']),
+            created_after=now - timedelta(hours=options['max_age_hours']),
+        )
+
+        started = time.perf_counter()
+
+        def progress(counts):
+            self.stdout.write(f"  checked {counts['checked']} ({time.perf_counter() - started:.1f}s)")
+
+        counts = reconcile_pending_orders(
+            orders, workers=workers, batch_size=options['batch_size'],
+            dry_run=options['dry_run'], progress=progress,
+        )
+        elapsed = time.perf_counter() - started
+
+        rate = counts['checked'] / elapsed if elapsed else 0
+        self.stdout.write(
+            f"Checked {counts['checked']} pending orders in {elapsed:.1f}s ({rate:.0f}/s): "
+            f"{counts['paid']} paid, {counts['failed']} failed, {counts['open']} still open, "
+            f"{counts['missing']} unknown to Paystack, {counts['error']} errors."
+        )
+        if options['dry_run']:
+            self.stdout.write('Dry run; nothing was changed.')
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Settled {counts['changed']} orders."))
+        if counts['error']:
+            self.stdout.write(self.style.WARNING('Orders that errored stay pending and are retried next run.'))
@@ -0,0 +1,29 @@
+"""
+Hand back stock held by pending orders whose reservation has expired.
+
+    python manage.py release_reservations
+
+Checkouts already sweep expired holds opportunistically; run this from
+cron as well so stock comes back during quiet periods.  Only relevant
+when ``STOCK_RESERVATION_TTL`` is set.
+"""
+
+from django.core.management.base import BaseCommand
+
+from shop.orders import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = 'Release stock held by pending orders whose reservation has expired.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Orders released per transaction.')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            released = release_expired_reservations(batch_size=options['batch_size'])
+            total += released
+            if released < options['batch_size']:
+                break
+        self.stdout.write(self.style.SUCCESS(f'Released {total} expired reservation{"" if total == 1 else "s"}.'))
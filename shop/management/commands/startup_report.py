@@ -0,0 +1,80 @@
+"""
+Measure a cold boot of the web app.
+
+    python manage.py startup_report
+    python manage.py startup_report --no-warmup --packages 15
+    python manage.py startup_report --json >> startup-history.ndjson
+
+Boots KONNECT_INC.wsgi (plus the worker warm-up) in a fresh interpreter
+run with ``-X importtime`` and prints the per-phase timings from
+KONNECT_INC.startup, then the packages that cost the most to import.
+Numbers from the same machine are comparable run to run, so this is the
+thing to check after adding a dependency.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+BOOT_SCRIPT = '''
+import json
+from KONNECT_INC import startup, wsgi
+if {warm_up}:
+    from shop.warmup import warm_up
+    warm_up()
+print(json.dumps(startup.report()))
+'''
+
+
+def _import_times(stderr):
+    """Self import time (ms) per top-level package from ``-X importtime``."""
+    totals = defaultdict(float)
+    for line in stderr.splitlines():
+        # "import time:  <self us> | <cumulative us> | <indented module>"
+        if not line.startswith('import time:'):
+            continue
+        self_us, _, module = line[len('import time:'):].split('|')
+        if self_us.strip().isdigit():
+            totals[module.strip().split('.')[0]] += int(self_us) / 1000
+    return totals
+
+
+class Command(BaseCommand):
+    help = 'Boot the app in a fresh process and report startup timings.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-warmup', action='store_true', help='Skip the gunicorn worker warm-up.')
+        parser.add_argument('--packages', type=int, default=10, help='How many of the slowest imports to list.')
+        parser.add_argument('--json', action='store_true', help='Print one JSON line instead of a table.')
+
+    def handle(self, *args, **options):
+        script = BOOT_SCRIPT.format(warm_up=not options['no_warmup'])
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'KONNECT_INC.settings')}
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', script],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f'Boot failed:\n{result.stderr[-2000:]}')
+        data = json.loads(result.stdout.strip().splitlines()[-1])
+        imports = sorted(_import_times(result.stderr).items(), key=lambda item: item[1], reverse=True)
+        data['imports_ms'] = {name: round(ms, 1) for name, ms in imports[:options['packages']]}
+
+        if options['json']:
+            self.stdout.write(json.dumps(data))
+            return
+
+        self.stdout.write('Phase                      ms')
+        for name, ms in data['phases'].items():
+            self.stdout.write(f'  {name:<22} {ms:>6.0f}')
+        self.stdout.write(self.style.SUCCESS(f"  {'total':<22} {data['boot_ms']:>6.0f}"))
+        self.stdout.write('')
+        self.stdout.write('Slowest imports (self time by package; includes -X importtime overhead)')
+        for name, ms in data['imports_ms'].items():
+            self.stdout.write(f'  {name:<22} {ms:>6.0f}')
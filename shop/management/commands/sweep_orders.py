@@ -0,0 +1,86 @@
+"""
+Cancel abandoned checkouts, archive old closed orders and forget expired
+idempotency keys.
+
+    python manage.py sweep_orders --dry-run
+    python manage.py sweep_orders
+    python manage.py sweep_orders --include-paid --retention-days 365
+
+Meant for a daily cron job.  Pending orders older than
+PENDING_ORDER_MAX_AGE_HOURS are cancelled (returning any reserved stock);
+failed and cancelled orders not touched for ORDER_RETENTION_DAYS are
+moved to the archive tables (see shop.archive).  Idempotency keys past
+IDEMPOTENCY_KEY_TTL are deleted (see shop.idempotency).
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from shop.archive import DEFAULT_STATUSES, archivable_orders, archive_orders
+from shop.idempotency import purge_expired_keys
+from shop.orders import cancel_stale_orders
+
+
+class Command(BaseCommand):
+    help = 'Cancel stale pending orders and archive old closed ones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pending-hours', type=int, default=settings.PENDING_ORDER_MAX_AGE_HOURS,
+                            help='Cancel pending orders older than this.')
+        parser.add_argument('--retention-days', type=int, default=settings.ORDER_RETENTION_DAYS,
+                            help='Archive closed orders not updated for this long.')
+        parser.add_argument('--include-paid', action='store_true',
+                            help='Archive paid orders too (they drop out of exports and rollup rebuilds).')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would change.')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+
+        pending_cutoff = now - timedelta(hours=options['pending_hours'])
+        if dry_run:
+            count = cancel_stale_orders(pending_cutoff, dry_run=True)
+            self.stdout.write(f'Would cancel {count} pending orders created before {pending_cutoff:%Y-%m-%d %H:%M}.')
+        else:
+            cancelled = 0
+            while True:
+                done = cancel_stale_orders(pending_cutoff, batch_size)
+                cancelled += done
+                if done:
+                    self.stdout.write(f'  cancelled {cancelled} so far')
+                if done < batch_size:
+                    break
+            self.stdout.write(self.style.SUCCESS(f'Cancelled {cancelled} stale pending orders.'))
+
+        statuses = DEFAULT_STATUSES + (('paid',) if options['include_paid'] else ())
+        archive_cutoff = now - timedelta(days=options['retention_days'])
+        if dry_run:
+            count = archivable_orders(archive_cutoff, statuses).count()
+            self.stdout.write(
+                f'Would archive {count} {"/".join(statuses)} orders last updated before {archive_cutoff:%Y-%m-%d}.'
+            )
+            return
+
+        orders = items = skipped = last_id = 0
+        while True:
+            moved_orders, moved_items, batch_skipped, last_id = archive_orders(
+                archive_cutoff, statuses, batch_size, after_id=last_id,
+            )
+            orders += moved_orders
+            items += moved_items
+            skipped += batch_skipped
+            if moved_orders:
+                self.stdout.write(f'  archived {orders} orders ({items} items) so far')
+            if last_id is None or moved_orders + batch_skipped < batch_size:
+                break
+        self.stdout.write(self.style.SUCCESS(f'Archived {orders} orders and {items} line items.'))
+        if skipped:
+            self.stdout.write(self.style.WARNING(f'Skipped {skipped} orders that could not be archived (see the log).'))
+
+        purged = purge_expired_keys(now)
+        self.stdout.write(self.style.SUCCESS(f'Deleted {purged} expired idempotency keys.'))
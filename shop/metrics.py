@@ -0,0 +1,244 @@
+"""
+Request metrics, exposed in Prometheus text format at ``/metrics``.
+
+``MetricsMiddleware`` times every request (health probes are answered
+before it) and labels it with the URL name it resolved to, e.g.
+``shop-retail``, ``create-order`` or ``admin:shop_order_changelist``:
+
+* ``konnect_request_seconds``: latency by view, method and status class.
+* ``konnect_request_db_queries`` / ``konnect_request_db_seconds``: SQL
+  statements per request and the time spent in them.
+* ``konnect_request_outbound_seconds``: time per request spent waiting
+  on Paystack or Cloudinary.
+* ``konnect_outbound_call_seconds``: every outbound call, by service,
+  operation and outcome, whether or not a request made it.
+* ``konnect_webhook_inbox_*``: webhook queue depth, read at scrape time.
+
+Queries are timed by an execute wrapper installed on every database
+connection and charged to the current request through a context
+variable, so SQL run in ``sync_to_async`` threads by the async views
+still lands on the right request.
+
+Threads of a worker share its metrics.  Under gunicorn, workers write
+their samples to files in ``PROMETHEUS_MULTIPROC_DIR`` (set up by
+gunicorn.conf.py) and a scrape adds up every worker's.
+
+Requests slower than ``settings.SLOW_REQUEST_SECONDS`` are logged with
+the SQL they ran.
+"""
+
+import hmac
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+
+logger = logging.getLogger(__name__)
+
+
+# Slow-request log: at most this many statements, each cut to this length.
+MAX_LOGGED_STATEMENTS = 50
+MAX_STATEMENT_LENGTH = 1000
+
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+REQUEST_SECONDS = Histogram(
+    'konnect_request_seconds', 'Request latency.',
+    ['view', 'method', 'status'],
+)
+REQUEST_DB_QUERIES = Histogram(
+    'konnect_request_db_queries', 'SQL statements run per request.',
+    ['view'], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144),
+)
+REQUEST_DB_SECONDS = Histogram(
+    'konnect_request_db_seconds', 'Time per request spent in SQL.',
+    ['view'],
+)
+REQUEST_OUTBOUND_SECONDS = Histogram(
+    'konnect_request_outbound_seconds', 'Time per request spent on outbound HTTP calls.',
+    ['view', 'service'],
+)
+OUTBOUND_CALL_SECONDS = Histogram(
+    'konnect_outbound_call_seconds', 'Outbound HTTP call latency.',
+    ['service', 'operation', 'outcome'],
+)
+
+
+class _RequestStats:
+    __slots__ = ('queries', 'db_seconds', 'outbound', 'statements')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.outbound = {}
+        self.statements = []
+
+
+_current = ContextVar('konnect_request_stats', default=None)
+
+
+# ── Database and outbound calls ──────────────────────────────
+
+def _record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        stats.queries += 1
+        stats.db_seconds += elapsed
+        if len(stats.statements) < MAX_LOGGED_STATEMENTS:
+            stats.statements.append((elapsed, sql))
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """``connection_created`` receiver: time this connection's queries.
+
+    The wrapper list belongs to the per-thread connection object and
+    survives reconnects, hence the membership check.
+    """
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def observe_outbound(service, operation, seconds, ok=True):
+    """Record one outbound call, and charge it to the current request."""
+    OUTBOUND_CALL_SECONDS.labels(service, operation, 'ok' if ok else 'error').observe(seconds)
+    stats = _current.get()
+    if stats is not None:
+        stats.outbound[service] = stats.outbound.get(service, 0.0) + seconds
+
+
+@contextmanager
+def outbound_call(service, operation):
+    """Time the enclosed block as an outbound call."""
+    started = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        observe_outbound(service, operation, time.perf_counter() - started, ok)
+
+
+# ── Middleware ───────────────────────────────────────────────
+
+def _view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    return (match.view_name or match._func_path) if match else 'unresolved'
+
+
+def _log_slow(request, response, view, elapsed, stats):
+    outbound = ', '.join(f'{service} {seconds * 1000:.0f}ms' for service, seconds in stats.outbound.items())
+    statements = '\n'.join(
+        f'  {seconds * 1000:8.1f}ms  {sql[:MAX_STATEMENT_LENGTH]}' for seconds, sql in stats.statements
+    )
+    logger.warning(
+        'Slow request: %s %s -> %s in %.0fms (view %s; %d queries, %.0fms SQL%s)\n%s',
+        request.method, request.path, response.status_code, elapsed * 1000, view,
+        stats.queries, stats.db_seconds * 1000, f'; {outbound}' if outbound else '', statements,
+    )
+
+
+def _finish(request, response, stats, elapsed):
+    view = _view_label(request)
+    method = request.method if request.method in METHODS else 'other'
+    REQUEST_SECONDS.labels(view, method, f'{response.status_code // 100}xx').observe(elapsed)
+    REQUEST_DB_QUERIES.labels(view).observe(stats.queries)
+    REQUEST_DB_SECONDS.labels(view).observe(stats.db_seconds)
+    for service, seconds in stats.outbound.items():
+        REQUEST_OUTBOUND_SECONDS.labels(view, service).observe(seconds)
+    if elapsed >= settings.SLOW_REQUEST_SECONDS:
+        _log_slow(request, response, view, elapsed, stats)
+
+
+class MetricsMiddleware:
+    """Time each request and count its SQL and outbound calls.
+
+    Streaming responses are timed up to the first byte.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = _RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        _finish(request, response, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        stats = _RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        _finish(request, response, stats, time.perf_counter() - started)
+        return response
+
+
+# ── Exposition ───────────────────────────────────────────────
+
+class _InboxCollector:
+    """Webhook queue depth, read from the database on each scrape."""
+
+    def collect(self):
+        from .webhooks import inbox_stats
+
+        stats = inbox_stats()
+        yield GaugeMetricFamily('konnect_webhook_inbox_pending', 'Webhook events waiting to be applied.',
+                                value=stats['pending'])
+        yield GaugeMetricFamily('konnect_webhook_inbox_dead', 'Webhook events that ran out of attempts.',
+                                value=stats['dead'])
+        yield GaugeMetricFamily('konnect_webhook_inbox_lag_seconds', 'Age of the oldest pending webhook event.',
+                                value=stats['lag_seconds'])
+
+
+_scrape_time_registry = CollectorRegistry(auto_describe=False)
+_scrape_time_registry.register(_InboxCollector())
+
+
+def is_authorized(request):
+    """Scrapers send ``Authorization: Bearer <METRICS_TOKEN>``; staff can
+    also look while logged in to the admin."""
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if settings.METRICS_TOKEN and header.startswith('Bearer '):
+        return hmac.compare_digest(header[len('Bearer '):].encode(), settings.METRICS_TOKEN.encode())
+    return request.user.is_active and request.user.is_staff
+
+
+def render():
+    """Return ``(body, content_type)`` for a scrape."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry) + generate_latest(_scrape_time_registry), CONTENT_TYPE_LATEST
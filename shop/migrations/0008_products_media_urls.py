@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:18
+
+from django.db import migrations, models
+
+
+# A frozen copy of shop.media's variants when this migration was written;
+# later changes are applied with ``manage.py backfill_media_urls --all``.
+AUTO_FORMAT = {'fetch_format': 'auto', 'quality': 'auto'}
+
+VARIANTS = {
+    'product_image': {
+        'thumb': {'width': 120, 'height': 120, 'crop': 'fill', **AUTO_FORMAT},
+        'thumb_2x': {'width': 240, 'height': 240, 'crop': 'fill', **AUTO_FORMAT},
+        'card': {'width': 400, 'crop': 'limit', **AUTO_FORMAT},
+        'card_2x': {'width': 800, 'crop': 'limit', **AUTO_FORMAT},
+        'zoom': {'width': 1600, 'crop': 'limit', **AUTO_FORMAT},
+    },
+    'product_video': {
+        'video': {'quality': 'auto'},
+        'poster': {'format': 'jpg', 'start_offset': 'auto', 'width': 800, 'crop': 'limit', 'quality': 'auto'},
+    },
+}
+
+
+def media_urls(Products, product):
+    urls = {}
+    try:
+        for field_name, variants in VARIANTS.items():
+            resource = Products._meta.get_field(field_name).to_python(getattr(product, field_name))
+            if resource:
+                for name, options in variants.items():
+                    urls[name] = resource.build_url(**options)
+    except ValueError:
+        # No cloud_name configured: leave it to backfill_media_urls.
+        return {}
+    return urls
+
+
+def backfill_media_urls(apps, schema_editor):
+    Products = apps.get_model('shop', 'Products')
+    products = list(Products.objects.all())
+    for product in products:
+        product.media_urls = media_urls(Products, product)
+    Products.objects.bulk_update(products, ['media_urls'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0007_products_wholesale_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='products',
+            name='media_urls',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Transformed Cloudinary URLs, rebuilt on save (see shop.media)'),
+        ),
+        migrations.RunPython(backfill_media_urls, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+from django.db import migrations
+
+
+# The index as shop.search defined it when this migration was written
+# (shop.search re-checks it after every migrate).
+POSTGRES_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS shop_products_name_trgm ON shop_products USING gin ((UPPER(product_name::text)) gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS shop_products_code_trgm ON shop_products USING gin ((UPPER(product_code::text)) gin_trgm_ops)',
+]
+
+SQLITE_SQL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS shop_products_fts USING fts5(
+        product_name, product_code, content='shop_products', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS shop_products_fts_ai AFTER INSERT ON shop_products BEGIN
+        INSERT INTO shop_products_fts(rowid, product_name, product_code)
+        VALUES (new.id, new.product_name, new.product_code);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS shop_products_fts_ad AFTER DELETE ON shop_products BEGIN
+        INSERT INTO shop_products_fts(shop_products_fts, rowid, product_name, product_code)
+        VALUES ('delete', old.id, old.product_name, old.product_code);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS shop_products_fts_au AFTER UPDATE OF product_name, product_code ON shop_products BEGIN
+        INSERT INTO shop_products_fts(shop_products_fts, rowid, product_name, product_code)
+        VALUES ('delete', old.id, old.product_name, old.product_code);
+        INSERT INTO shop_products_fts(rowid, product_name, product_code)
+        VALUES (new.id, new.product_name, new.product_code);
+    END""",
+    # Index the rows that already exist.
+    "INSERT INTO shop_products_fts(shop_products_fts) VALUES ('rebuild')",
+]
+
+
+def create_search_index(apps, schema_editor):
+    sql = {'postgresql': POSTGRES_SQL, 'sqlite': SQLITE_SQL}.get(schema_editor.connection.vendor, [])
+    for statement in sql:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0008_products_media_urls'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, migrations.RunPython.noop),
+    ]
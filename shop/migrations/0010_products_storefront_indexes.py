@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0009_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='products',
+            index=models.Index(condition=models.Q(('product_stock__gt', 0)), fields=['category', 'id'], name='products_retail_cat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='products',
+            index=models.Index(condition=models.Q(('wholesale_stock__gt', 0)), fields=['category', 'id'], name='products_wholesale_cat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='products',
+            index=models.Index(fields=['category', 'product_name'], name='products_cat_name_idx'),
+        ),
+    ]
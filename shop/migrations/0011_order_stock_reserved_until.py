@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0010_products_storefront_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='stock_reserved_until',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Set while this pending order holds stock (reservation mode)', null=True),
+        ),
+    ]
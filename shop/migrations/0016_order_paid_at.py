@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:13
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_paid_at(apps, schema_editor):
+    # Until now a paid order's updated_at stood in for its payment time.
+    for name in ('Order', 'ArchivedOrder'):
+        model = apps.get_model('shop', name)
+        model.objects.filter(status='paid', paid_at__isnull=True).update(paid_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0015_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedorder',
+            name='paid_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='paid_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='When the payment was confirmed (dates the sales reports)', null=True),
+        ),
+        migrations.RunPython(backfill_paid_at, migrations.RunPython.noop),
+    ]
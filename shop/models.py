@@ -1,7 +1,11 @@
-from django.db import models
+from django.core.files.uploadedfile import UploadedFile
+from django.db import models, transaction
 from cloudinary.models import CloudinaryField
 import uuid
 
+from .media import build_media_urls
+from .metrics import outbound_call
+
 # Create your models here.
 
 
@@ -24,6 +28,16 @@ class Products(models.Model):
     product_stock = models.IntegerField()
     wholesale_stock = models.IntegerField(default=0, help_text='Number of full boxes available for wholesale') 
     is_new = models.BooleanField(default=False)
+    media_urls = models.JSONField(default=dict, blank=True, editable=False, help_text='Transformed Cloudinary URLs, rebuilt on save (see shop.media)')
+
+    class Meta:
+        indexes = [
+            # Storefront keyset pages: in-stock products of one category by id.
+            models.Index(fields=['category', 'id'], condition=models.Q(product_stock__gt=0), name='products_retail_cat_idx'),
+            models.Index(fields=['category', 'id'], condition=models.Q(wholesale_stock__gt=0), name='products_wholesale_cat_idx'),
+            # Per-category listings ordered by name (catalogue PDF, admin).
+            models.Index(fields=['category', 'product_name'], name='products_cat_name_idx'),
+        ]
 
     @property
     def get_wholesale_price(self):
@@ -34,6 +48,39 @@ class Products(models.Model):
     def box_price(self):
         """Price for one full box = unit price × quantity per box."""
         return self.get_wholesale_price * self.quantity_per_box
+
+    def media_url(self, variant):
+        """Stored URL for a media variant, falling back to the original file.
+
+        The fallback only covers rows saved before ``media_urls`` existed
+        (``manage.py backfill_media_urls`` fills those in), and gives ''
+        rather than failing when Cloudinary isn't configured.
+        """
+        url = self.media_urls.get(variant)
+        if url:
+            return url
+        if variant == 'poster':
+            return ''
+        media = self.product_video if variant == 'video' else self.product_image
+        try:
+            return media.url if media else ''
+        except ValueError:
+            # cloudinary raises ValueError when no cloud_name is configured.
+            return ''
+
+    def save(self, *args, **kwargs):
+        # CloudinaryField uploads new files in pre_save, so a fresh upload
+        # only has a public id (and therefore URLs) once the row is written.
+        uploading = isinstance(self.product_image, UploadedFile) or isinstance(self.product_video, UploadedFile)
+        if not uploading:
+            self.media_urls = build_media_urls(self)
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            # Timed as a Cloudinary call: the upload dominates the save.
+            with outbound_call('cloudinary', 'upload'):
+                super().save(*args, **kwargs)
+            self.media_urls = build_media_urls(self)
+            Products.objects.filter(pk=self.pk).update(media_urls=self.media_urls)
     
     
     
@@ -48,6 +95,10 @@ class Order(models.Model):
         ('failed', 'Failed'),
         ('cancelled', 'Cancelled'),
     ]
+    ORDER_TYPE_CHOICES = [
+        ('retail', 'Retail'),
+        ('wholesale', 'Wholesale'),
+    ]
     
     order_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     email = models.EmailField()
@@ -56,9 +107,18 @@ class Order(models.Model):
     address = models.TextField()
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    order_type = models.CharField(max_length=20, choices=ORDER_TYPE_CHOICES, default='retail')
     paystack_reference = models.CharField(max_length=100, blank=True, null=True)
+    stock_reserved_until = models.DateTimeField(blank=True, null=True, db_index=True, help_text='Set while this pending order holds stock (reservation mode)')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    paid_at = models.DateTimeField(blank=True, null=True, editable=False, help_text='When the payment was confirmed (dates the sales reports)')
+    
+    class Meta:
+        indexes = [
+            # Admin status/date filters and the stale-order sweeper.
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+        ]
     
     def __str__(self):
         return f"Order {self.order_id} - {self.full_name}"
@@ -77,4 +137,130 @@ class OrderItem(models.Model):
     def subtotal(self):
         return self.quantity * self.price
 
- 
\ No newline at end of file
+ 
+
+
+# ── Order archive ────────────────────────────────────────────
+# Closed orders past the retention window are moved here by
+# ``manage.py sweep_orders`` (see shop.archive) to keep Order/OrderItem
+# small.  Rows keep their original ids.
+
+class ArchivedOrder(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order_id = models.UUIDField(unique=True)
+    email = models.EmailField()
+    phone = models.CharField(max_length=20)
+    full_name = models.CharField(max_length=100)
+    address = models.TextField()
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    order_type = models.CharField(max_length=20, choices=Order.ORDER_TYPE_CHOICES)
+    paystack_reference = models.CharField(max_length=100, blank=True, null=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    paid_at = models.DateTimeField(blank=True, null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived order {self.order_id} - {self.full_name}"
+
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    # Not a foreign key: archived lines outlive deleted products.
+    product_id = models.BigIntegerField()
+    product_name = models.CharField(max_length=50)
+    quantity = models.PositiveIntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.quantity}x {self.product_name}"
+
+
+class WebhookEvent(models.Model):
+    """A verified Paystack webhook, stored on receipt and applied later by
+    ``manage.py process_webhooks`` (see shop.webhooks)."""
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker's queue: unprocessed events, oldest first.
+            models.Index(
+                fields=['id'], name='webhookevent_pending_idx',
+                condition=models.Q(processed_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} {self.event_id}"
+
+
+class IdempotencyKey(models.Model):
+    """A claimed ``Idempotency-Key`` and, once the request succeeded, the
+    response to replay for it (see shop.idempotency)."""
+    scope = models.CharField(max_length=50)
+    key_hash = models.CharField(max_length=64, help_text='SHA-256 of the client\'s key')
+    fingerprint = models.CharField(max_length=64, help_text='SHA-256 of the request body')
+    claimed_at = models.DateTimeField()
+    # Null while the first request is still running.
+    status = models.PositiveSmallIntegerField(blank=True, null=True)
+    content = models.BinaryField(blank=True, null=True)
+    content_type = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key_hash'], name='idempotencykey_unique_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.key_hash[:12]}"
+
+
+# ── Sales rollups ────────────────────────────────────────────
+# One row per day (shop-local date the order was paid) and order type,
+# kept up to date by shop.analytics.record_paid_order and rebuilt from
+# history by ``manage.py rebuild_sales_rollups``.
+
+class SalesRollup(models.Model):
+    date = models.DateField()
+    order_type = models.CharField(max_length=20, choices=Order.ORDER_TYPE_CHOICES)
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        abstract = True
+
+
+class DailySales(SalesRollup):
+    class Meta:
+        verbose_name = 'Sales report'
+        verbose_name_plural = 'Sales report'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'order_type'], name='dailysales_unique_day'),
+        ]
+
+
+class DailyCategorySales(SalesRollup):
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'category', 'order_type'], name='dailycategorysales_unique_day'),
+        ]
+
+
+class DailyProductSales(SalesRollup):
+    product = models.ForeignKey(Products, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product', 'order_type'], name='dailyproductsales_unique_day'),
+        ]
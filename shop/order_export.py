@@ -0,0 +1,121 @@
+"""
+Streaming order exports for accounting.
+
+Orders are read with ``.iterator(chunk_size=...)`` and their line items
+prefetched per chunk, so an export costs two queries per chunk and holds
+one chunk in memory, however long the date range.  Output is produced a
+line at a time for ``StreamingHttpResponse`` or a file.
+
+* CSV: one row per line item, with the order's columns repeated.
+* NDJSON: one JSON object per order with its ``items`` nested.
+"""
+
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .models import Order, OrderItem
+
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+CHUNK_SIZE = 2000
+
+ORDER_FIELDS = [
+    'order_id', 'created_at', 'updated_at', 'status', 'order_type', 'full_name', 'email',
+    'phone', 'address', 'total_amount', 'paystack_reference',
+]
+ITEM_FIELDS = ['product_code', 'product_name', 'quantity', 'unit_price', 'line_total']
+
+
+def filter_orders(queryset=None, status=None, start=None, end=None):
+    """Orders with ``status`` created between the ``start`` and ``end``
+    dates (inclusive, shop-local)."""
+    if queryset is None:
+        queryset = Order.objects.all()
+    if status:
+        queryset = queryset.filter(status=status)
+    tz = timezone.get_current_timezone()
+    if start:
+        queryset = queryset.filter(created_at__gte=datetime.combine(start, time.min, tzinfo=tz))
+    if end:
+        queryset = queryset.filter(created_at__lt=datetime.combine(end + timedelta(days=1), time.min, tzinfo=tz))
+    return queryset
+
+
+def _orders(queryset, chunk_size):
+    items = OrderItem.objects.select_related('product').only(
+        'order_id', 'quantity', 'price', 'product__product_code', 'product__product_name',
+    ).order_by('id')
+    return (
+        queryset.order_by('id')
+        .only(*ORDER_FIELDS)
+        .prefetch_related(Prefetch('items', queryset=items))
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def _order_values(order):
+    return {
+        'order_id': str(order.order_id),
+        'created_at': timezone.localtime(order.created_at).isoformat(),
+        'updated_at': timezone.localtime(order.updated_at).isoformat(),
+        'status': order.status,
+        'order_type': order.order_type,
+        'full_name': order.full_name,
+        'email': order.email,
+        'phone': order.phone,
+        'address': order.address,
+        'total_amount': order.total_amount,
+        'paystack_reference': order.paystack_reference or '',
+    }
+
+
+def _item_values(item):
+    return {
+        'product_code': item.product.product_code or '',
+        'product_name': item.product.product_name,
+        'quantity': item.quantity,
+        'unit_price': item.price,
+        'line_total': item.price * item.quantity,
+    }
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def export_csv(queryset, chunk_size=CHUNK_SIZE):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(ORDER_FIELDS + ITEM_FIELDS)
+    blank_item = [''] * len(ITEM_FIELDS)
+    for order in _orders(queryset, chunk_size):
+        values = list(_order_values(order).values())
+        items = order.items.all()
+        if not items:
+            yield writer.writerow(values + blank_item)
+        for item in items:
+            yield writer.writerow(values + list(_item_values(item).values()))
+
+
+def export_ndjson(queryset, chunk_size=CHUNK_SIZE):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for order in _orders(queryset, chunk_size):
+        record = _order_values(order)
+        record['items'] = [_item_values(item) for item in order.items.all()]
+        yield encoder.encode(record) + '\n'
+
+
+def export_orders(queryset, fmt='csv', chunk_size=CHUNK_SIZE):
+    """Yield the export of ``queryset`` in ``fmt`` ('csv' or 'ndjson')."""
+    if fmt == 'ndjson':
+        return export_ndjson(queryset, chunk_size)
+    return export_csv(queryset, chunk_size)
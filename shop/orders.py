@@ -0,0 +1,229 @@
+"""
+Order creation and stock bookkeeping shared by the checkout views.
+
+Stock only ever moves through conditional ``UPDATE`` statements
+(``SET product_stock = product_stock - n WHERE product_stock >= n``), so
+concurrent payments can't lose each other's decrements.
+
+With ``settings.STOCK_RESERVATION_TTL`` set, ``create_pending_order``
+takes the stock up front and stamps ``Order.stock_reserved_until``;
+payment then only has to clear the stamp, and holds that outlive the
+TTL are handed back by ``release_expired_reservations``.
+"""
+
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .analytics import record_paid_order
+from .catalog import bump_catalog_version_on_commit
+from .models import Products, Order, OrderItem
+
+
+logger = logging.getLogger(__name__)
+
+
+CENT = Decimal('0.01')
+
+# Checkouts sweep expired holds at most this often (seconds).
+RESERVATION_SWEEP_INTERVAL = 30
+
+
+class OrderError(Exception):
+    """A cart or customer problem to report back to the shopper (HTTP 400)."""
+
+
+def to_money(value):
+    """Convert a float price column to a 2dp Decimal without float noise."""
+    return Decimal(str(value)).quantize(CENT)
+
+
+def parse_cart(cart_items):
+    """Return ``{product_id: quantity}`` for the posted cart lines.
+
+    Lines for the same product are merged so stock is checked against
+    the total quantity asked for.
+    """
+    quantities = {}
+    try:
+        for item in cart_items:
+            product_id = int(item['id'])
+            quantities[product_id] = quantities.get(product_id, 0) + int(item['quantity'])
+    except (KeyError, TypeError, ValueError):
+        raise OrderError('Invalid cart item')
+    for product_id, quantity in quantities.items():
+        if quantity < 1:
+            raise OrderError(f'Invalid quantity for product with ID {product_id}')
+    return quantities
+
+
+def create_pending_order(cart_items, email, phone, full_name, address, order_type='retail'):
+    """Validate the cart and write a pending order with its items.
+
+    All cart products are fetched with one query and the order plus its
+    items are written in one transaction (one INSERT for the items), so
+    checkout costs the same handful of queries whatever the cart size.
+    """
+    quantities = parse_cart(cart_items)
+    products = Products.objects.in_bulk(list(quantities))
+
+    prices = {}
+    total = Decimal('0.00')
+    for product_id, quantity in quantities.items():
+        product = products.get(product_id)
+        if product is None:
+            raise OrderError(f'Product with ID {product_id} not found')
+        if quantity > product.product_stock:
+            raise OrderError(f'{product.product_name} only has {product.product_stock} in stock')
+        prices[product_id] = to_money(product.product_price)
+        total += prices[product_id] * quantity
+
+    reservation_ttl = settings.STOCK_RESERVATION_TTL
+    if reservation_ttl:
+        sweep_expired_reservations()
+
+    with transaction.atomic():
+        order = Order.objects.create(
+            email=email,
+            phone=phone,
+            full_name=full_name,
+            address=address,
+            total_amount=total,
+            status='pending',
+            order_type=order_type,
+            stock_reserved_until=timezone.now() + timedelta(seconds=reservation_ttl) if reservation_ttl else None,
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_id=product_id, quantity=quantity, price=prices[product_id])
+            for product_id, quantity in quantities.items()
+        ])
+        if reservation_ttl:
+            for product_id, quantity in quantities.items():
+                if not take_stock(product_id, quantity):
+                    # Someone else got there first; the rollback undoes
+                    # the holds already taken for this order.
+                    product = products[product_id]
+                    raise OrderError(f'{product.product_name} no longer has {quantity} in stock')
+    return order
+
+
+def take_stock(product_id, quantity):
+    """Atomically remove ``quantity`` units; False if not enough is left."""
+    taken = Products.objects.filter(pk=product_id, product_stock__gte=quantity).update(
+        product_stock=F('product_stock') - quantity
+    )
+    if taken:
+        bump_catalog_version_on_commit()
+    return bool(taken)
+
+
+def _restock(order_ids):
+    """Hand the stock of ``order_ids`` back, one UPDATE per product."""
+    quantities = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values('product_id').annotate(quantity=Sum('quantity'))
+    )
+    for row in quantities:
+        Products.objects.filter(pk=row['product_id']).update(product_stock=F('product_stock') + row['quantity'])
+    bump_catalog_version_on_commit()
+
+
+def mark_order_paid(order):
+    """Mark ``order`` paid and take its stock, exactly once.
+
+    Safe to call from both ``verify_payment`` and the webhook: the status
+    change is a conditional UPDATE, so only the first caller moves stock.
+    Returns True if this call did the transition.  The order is added to
+    the sales rollups in the same transaction.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # Stock already held by a reservation: just convert the hold.
+        converted = Order.objects.filter(pk=order.pk, stock_reserved_until__isnull=False).exclude(status='paid').update(
+            status='paid', stock_reserved_until=None, updated_at=now, paid_at=now
+        )
+        if converted:
+            record_paid_order(order, now)
+            return True
+
+        paid = Order.objects.filter(pk=order.pk).exclude(status='paid').update(status='paid', updated_at=now, paid_at=now)
+        if not paid:
+            return False
+        for product_id, quantity in order.items.values_list('product_id', 'quantity'):
+            if not take_stock(product_id, quantity):
+                # The money is already taken, so the order stands; flag
+                # the shortfall for staff instead of failing the payment.
+                logger.warning('Order %s oversold product %s by up to %s units', order.order_id, product_id, quantity)
+        record_paid_order(order, now)
+    return True
+
+
+def fail_order(order, status='failed'):
+    """Close a pending order, returning any stock it was holding.
+
+    Returns True if this call closed it (False if it was already paid or
+    closed).
+    """
+    with transaction.atomic():
+        pending = Order.objects.filter(pk=order.pk, status='pending')
+        released = pending.filter(stock_reserved_until__isnull=False).update(stock_reserved_until=None)
+        if released:
+            _restock([order.pk])
+        return bool(pending.update(status=status, updated_at=timezone.now()))
+
+
+def release_expired_reservations(now=None, batch_size=500):
+    """Return stock held by pending orders whose reservation has expired.
+
+    The orders stay pending (a late payment is still honoured and will
+    take stock the normal way).  Returns the number of orders released.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        order_ids = list(
+            Order.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', stock_reserved_until__lt=now)
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not order_ids:
+            return 0
+        Order.objects.filter(id__in=order_ids).update(stock_reserved_until=None)
+        _restock(order_ids)
+    return len(order_ids)
+
+
+def sweep_expired_reservations():
+    """Release expired holds, at most once per interval across workers."""
+    if cache.add('orders:reservation_sweep', True, RESERVATION_SWEEP_INTERVAL):
+        release_expired_reservations()
+
+
+def cancel_stale_orders(created_before, batch_size=500, dry_run=False):
+    """Cancel pending orders created before ``created_before``, one batch.
+
+    Any stock they still hold is handed back in the same transaction.
+    Returns the number of orders cancelled (or that would be, for a dry
+    run); call repeatedly until it returns less than ``batch_size``.
+    """
+    stale = Order.objects.filter(status='pending', created_at__lt=created_before)
+    if dry_run:
+        return stale.count()
+    with transaction.atomic():
+        order_ids = list(stale.select_for_update(skip_locked=True).values_list('id', flat=True)[:batch_size])
+        if not order_ids:
+            return 0
+        holding = list(
+            Order.objects.filter(id__in=order_ids, stock_reserved_until__isnull=False).values_list('id', flat=True)
+        )
+        if holding:
+            _restock(holding)
+        Order.objects.filter(id__in=order_ids).update(
+            status='cancelled', stock_reserved_until=None, updated_at=timezone.now()
+        )
+    return len(order_ids)
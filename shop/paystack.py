@@ -0,0 +1,250 @@
+"""
+Shared Paystack API client.
+
+Every call goes through one ``requests.Session`` per process, so checkout
+reuses a kept-alive TLS connection to Paystack instead of handshaking on
+every request.  Calls have bounded connect/read timeouts, failed
+connections are retried with backoff, and each call's latency is recorded
+for ``call_stats()``.
+
+The ``a``-prefixed functions are the same calls for the async views (see
+shop.async_views): they share one ``httpx.AsyncClient`` per event loop, so
+an ASGI worker can wait on hundreds of Paystack calls without a thread
+each.  httpx is only imported when they are first used.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .metrics import observe_outbound
+
+
+logger = logging.getLogger(__name__)
+
+
+# Latency samples kept per operation for the percentiles in call_stats().
+SAMPLE_SIZE = 500
+
+# Responses worth retrying a GET for, and the backoff between attempts.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+BACKOFF_FACTOR = 0.25
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+_async_client = None
+_async_client_loop = None
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+class PaystackError(Exception):
+    """Paystack couldn't be reached or sent back something unusable."""
+
+
+def _build_session():
+    retry = Retry(
+        total=settings.PAYSTACK_MAX_RETRIES,
+        # Retry failed connections for any method: nothing reached Paystack.
+        connect=settings.PAYSTACK_MAX_RETRIES,
+        # Read timeouts and 5xx are only retried for GET; a POST might have
+        # gone through and must not be sent twice.
+        read=settings.PAYSTACK_MAX_RETRIES,
+        status=settings.PAYSTACK_MAX_RETRIES,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({'GET'}),
+        backoff_factor=BACKOFF_FACTOR,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.PAYSTACK_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
+        'Authorization': f'Bearer {settings.PAYSTACK_SECRET_KEY}',
+        'Content-Type': 'application/json',
+    })
+    return session
+
+
+def get_session():
+    """Return this process's pooled session.
+
+    Keyed on the pid so a worker forked from a parent that already made
+    a call doesn't share the parent's sockets.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                _session = _build_session()
+                _session_pid = pid
+    return _session
+
+
+def _build_async_client():
+    import httpx
+
+    return httpx.AsyncClient(
+        headers={
+            'Authorization': f'Bearer {settings.PAYSTACK_SECRET_KEY}',
+            'Content-Type': 'application/json',
+        },
+        timeout=httpx.Timeout(settings.PAYSTACK_READ_TIMEOUT, connect=settings.PAYSTACK_CONNECT_TIMEOUT),
+        # The transport only retries failed connections, for any method.
+        transport=httpx.AsyncHTTPTransport(
+            retries=settings.PAYSTACK_MAX_RETRIES,
+            limits=httpx.Limits(
+                max_connections=settings.PAYSTACK_ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.PAYSTACK_POOL_SIZE,
+            ),
+        ),
+    )
+
+
+def get_async_client():
+    """Return the pooled async client for the running event loop.
+
+    An httpx client belongs to the loop it was first used on; an ASGI
+    worker runs one loop for its whole life, so this is built once.
+    """
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client_loop is not loop:
+        _async_client = _build_async_client()
+        _async_client_loop = loop
+    return _async_client
+
+
+def _record(operation, seconds, ok):
+    with _stats_lock:
+        stats = _stats.setdefault(operation, {
+            'calls': 0, 'errors': 0, 'total_seconds': 0.0, 'max_seconds': 0.0,
+            'samples': deque(maxlen=SAMPLE_SIZE),
+        })
+        stats['calls'] += 1
+        stats['errors'] += 0 if ok else 1
+        stats['total_seconds'] += seconds
+        stats['max_seconds'] = max(stats['max_seconds'], seconds)
+        stats['samples'].append(seconds)
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def call_stats():
+    """Per-operation call counts and latencies (seconds) for this process."""
+    snapshot = {}
+    with _stats_lock:
+        for operation, stats in _stats.items():
+            ordered = sorted(stats['samples'])
+            snapshot[operation] = {
+                'calls': stats['calls'],
+                'errors': stats['errors'],
+                'mean': stats['total_seconds'] / stats['calls'],
+                'max': stats['max_seconds'],
+                'p50': _percentile(ordered, 0.50),
+                'p95': _percentile(ordered, 0.95),
+                'p99': _percentile(ordered, 0.99),
+            }
+    return snapshot
+
+
+def _call(operation, method, path, **kwargs):
+    """Send one API request and return the decoded JSON body."""
+    url = f'{settings.PAYSTACK_API_URL.rstrip("/")}{path}'
+    timeout = (settings.PAYSTACK_CONNECT_TIMEOUT, settings.PAYSTACK_READ_TIMEOUT)
+    started = time.perf_counter()
+    ok = False
+    try:
+        response = get_session().request(method, url, timeout=timeout, **kwargs)
+        try:
+            body = response.json()
+        except ValueError:
+            raise PaystackError(f'Unexpected response from Paystack (HTTP {response.status_code})')
+        ok = response.status_code < 500
+        return body
+    except requests.exceptions.RequestException as e:
+        raise PaystackError(str(e)) from e
+    finally:
+        elapsed = time.perf_counter() - started
+        _record(operation, elapsed, ok)
+        observe_outbound('paystack', operation, elapsed, ok)
+        logger.info('paystack %s took %.0fms%s', operation, elapsed * 1000, '' if ok else ' (failed)')
+
+
+async def _acall(operation, method, path, **kwargs):
+    """``_call`` for async views, with the same retry rules: failed
+    connections are retried by the transport, read errors and
+    RETRY_STATUSES only for GET."""
+    import httpx
+
+    url = f'{settings.PAYSTACK_API_URL.rstrip("/")}{path}'
+    attempts = 1 + (settings.PAYSTACK_MAX_RETRIES if method == 'GET' else 0)
+    started = time.perf_counter()
+    ok = False
+    try:
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            try:
+                response = await get_async_client().request(method, url, **kwargs)
+            except httpx.HTTPError as e:
+                if last:
+                    raise PaystackError(str(e) or type(e).__name__) from e
+            else:
+                if last or response.status_code not in RETRY_STATUSES:
+                    try:
+                        body = response.json()
+                    except ValueError:
+                        raise PaystackError(f'Unexpected response from Paystack (HTTP {response.status_code})')
+                    ok = response.status_code < 500
+                    return body
+            await asyncio.sleep(BACKOFF_FACTOR * 2 ** attempt)
+    finally:
+        elapsed = time.perf_counter() - started
+        _record(operation, elapsed, ok)
+        observe_outbound('paystack', operation, elapsed, ok)
+        logger.info('paystack %s took %.0fms%s', operation, elapsed * 1000, '' if ok else ' (failed)')
+
+
+def initialize_transaction(payload):
+    """POST /transaction/initialize; returns Paystack's JSON response."""
+    return _call('initialize', 'POST', '/transaction/initialize', json=payload)
+
+
+def verify_transaction(reference):
+    """GET /transaction/verify/<reference>; returns Paystack's JSON response."""
+    return _call('verify', 'GET', f'/transaction/verify/{requests.utils.quote(str(reference), safe="")}')
+
+
+def charge_succeeded(reference):
+    """True if Paystack reports the transaction for ``reference`` as paid."""
+    response = verify_transaction(reference)
+    return bool(response.get('status')) and (response.get('data') or {}).get('status') == 'success'
+
+
+async def ainitialize_transaction(payload):
+    return await _acall('initialize', 'POST', '/transaction/initialize', json=payload)
+
+
+async def averify_transaction(reference):
+    return await _acall('verify', 'GET', f'/transaction/verify/{requests.utils.quote(str(reference), safe="")}')
+
+
+async def acharge_succeeded(reference):
+    response = await averify_transaction(reference)
+    return bool(response.get('status')) and (response.get('data') or {}).get('status') == 'success'
@@ -0,0 +1,259 @@
+"""
+Bulk product import and export, keyed by ``product_code``.
+
+Imports read a CSV or XLSX sheet row by row, check it a chunk at a time
+against one query per chunk, and produce a plan: the per-product field
+changes plus any row errors.  Staff review the plan in the admin, then
+``apply_plan`` writes it with ``bulk_update`` in batches inside one
+transaction, skipping any product that changed since the preview.
+Only prices, stock and box size can be changed this way; a blank cell
+leaves the current value alone.
+
+Exports stream every product as CSV in the same column layout, so an
+export can be edited and imported straight back.
+"""
+
+import csv
+import io
+import itertools
+
+from django.db import transaction
+
+from .catalog import bump_catalog_version_on_commit
+from .models import Products
+
+
+EXPORT_COLUMNS = [
+    'product_code', 'product_name', 'category', 'product_price', 'wholesale_price',
+    'quantity_per_box', 'product_stock', 'wholesale_stock', 'is_new',
+]
+
+# Column -> (parser, minimum value).  Everything else in a sheet is ignored.
+UPDATABLE_FIELDS = {
+    'product_price': (float, 0),
+    'wholesale_price': (float, 0),
+    'quantity_per_box': (int, 1),
+    'product_stock': (int, 0),
+    'wholesale_stock': (int, 0),
+}
+
+CHUNK_SIZE = 1000
+BATCH_SIZE = 500
+
+
+class ImportFileError(Exception):
+    """The uploaded file can't be read as a product sheet."""
+
+
+# ── Reading sheets ───────────────────────────────────────────
+
+def _csv_rows(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.reader(text)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise ImportFileError(f'Could not read the CSV file: {e}')
+    finally:
+        text.detach()
+
+
+def _xlsx_rows(file):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFileError('XLSX import needs openpyxl; upload a CSV instead.')
+    try:
+        # read_only streams the sheet instead of loading every cell.
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except Exception as e:
+        raise ImportFileError(f'Could not read the XLSX file: {e}')
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield ['' if value is None else value for value in row]
+    finally:
+        workbook.close()
+
+
+def read_sheet(file, filename):
+    """Yield ``(row_number, {column: value})`` for each data row."""
+    if filename.lower().endswith('.xlsx'):
+        rows = _xlsx_rows(file)
+    elif filename.lower().endswith('.csv'):
+        rows = _csv_rows(file)
+    else:
+        raise ImportFileError('Upload a .csv or .xlsx file.')
+
+    header = next(rows, None)
+    if header is None:
+        raise ImportFileError('The file is empty.')
+    header = [str(name).strip().lower() for name in header]
+    if 'product_code' not in header:
+        raise ImportFileError('The first row must be a header with a product_code column.')
+    if not set(header) & set(UPDATABLE_FIELDS):
+        raise ImportFileError(f'No columns to update; expected some of: {", ".join(UPDATABLE_FIELDS)}.')
+
+    for number, row in enumerate(rows, start=2):
+        if not any(str(value).strip() for value in row):
+            continue
+        yield number, dict(zip(header, row))
+
+
+# ── Planning ─────────────────────────────────────────────────
+
+def _parse(field, value):
+    """Return the parsed value, ``None`` for a blank cell; ValueError if bad."""
+    if isinstance(value, str):
+        value = value.strip().replace(',', '')
+        if value == '':
+            return None
+    parser, minimum = UPDATABLE_FIELDS[field]
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} must be a number, not {value!r}')
+    if parser is int:
+        if not number.is_integer():
+            raise ValueError(f'{field} must be a whole number')
+        number = int(number)
+    else:
+        number = round(number, 2)
+    if number < minimum:
+        raise ValueError(f'{field} must be at least {minimum}')
+    return number
+
+
+def _plan_chunk(chunk, plan, seen):
+    codes = [str(row.get('product_code', '')).strip() for _, row in chunk]
+    products = {
+        p.product_code: p
+        for p in Products.objects.filter(product_code__in=[c for c in codes if c])
+        .only('id', 'product_code', 'product_name', *UPDATABLE_FIELDS)
+    }
+    for (number, row), code in zip(chunk, codes):
+        if not code:
+            plan['errors'].append((number, '', 'Missing product_code'))
+            continue
+        if code in seen:
+            plan['errors'].append((number, code, f'Duplicate of row {seen[code]}'))
+            continue
+        seen[code] = number
+        product = products.get(code)
+        if product is None:
+            plan['errors'].append((number, code, 'No product with this code'))
+            continue
+
+        changes = {}
+        try:
+            for field in UPDATABLE_FIELDS:
+                if field not in row:
+                    continue
+                new = _parse(field, row[field])
+                old = getattr(product, field)
+                if new is not None and new != old:
+                    changes[field] = (old, new)
+        except ValueError as e:
+            plan['errors'].append((number, code, str(e)))
+            continue
+        if changes:
+            plan['changes'].append({
+                'id': product.id,
+                'code': code,
+                'name': product.product_name,
+                'changes': changes,
+            })
+        else:
+            plan['unchanged'] += 1
+
+
+def plan_import(rows, chunk_size=CHUNK_SIZE):
+    """Check ``rows`` from ``read_sheet`` against the database.
+
+    Returns ``{'changes': [...], 'errors': [(row, code, message)],
+    'unchanged': n}``; nothing is written.
+    """
+    plan = {'changes': [], 'errors': [], 'unchanged': 0}
+    seen = {}
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            break
+        _plan_chunk(chunk, plan, seen)
+    return plan
+
+
+# ── Applying ─────────────────────────────────────────────────
+
+def _conflict(product, change):
+    """Why ``change`` can't be applied to the locked ``product``, or None."""
+    if product is None:
+        return 'deleted since the preview'
+    for field, (old, _) in change['changes'].items():
+        current = getattr(product, field)
+        if current != old:
+            return f'{field} is now {current}, was {old} in the preview'
+    return None
+
+
+def apply_plan(plan, batch_size=BATCH_SIZE):
+    """Write a plan's changes; returns ``(updated, conflicts)``.
+
+    A product whose previewed values no longer match the database (an
+    order took stock, someone edited it) is left alone and reported in
+    ``conflicts`` as ``(code, reason)``, rather than having the newer
+    value overwritten; import the sheet again to update it.
+
+    Bypasses ``Products.save()`` (and its Cloudinary work) via
+    ``bulk_update``, so the catalog version is bumped here instead of by
+    the model signals.
+    """
+    changes = plan['changes']
+    updated = 0
+    conflicts = []
+    with transaction.atomic():
+        for start in range(0, len(changes), batch_size):
+            batch = changes[start:start + batch_size]
+            products = Products.objects.select_for_update().only('id', *UPDATABLE_FIELDS).in_bulk(
+                [change['id'] for change in batch]
+            )
+            to_update = []
+            fields = set()
+            for change in batch:
+                product = products.get(change['id'])
+                reason = _conflict(product, change)
+                if reason:
+                    conflicts.append((change['code'], reason))
+                    continue
+                for field, (_, new) in change['changes'].items():
+                    setattr(product, field, new)
+                fields.update(change['changes'])
+                to_update.append(product)
+            # bulk_update's cost is per object *per field*, and a stock take
+            # usually touches one or two columns, so only write those.
+            if to_update:
+                Products.objects.bulk_update(to_update, sorted(fields))
+                updated += len(to_update)
+        if updated:
+            bump_catalog_version_on_commit()
+    return updated, conflicts
+
+
+# ── Export ───────────────────────────────────────────────────
+
+class _Echo:
+    """File-like object whose write() just hands the line back."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(chunk_size=2000):
+    """Yield the CSV export line by line (header first)."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    products = Products.objects.order_by('id').values_list(
+        'product_code', 'product_name', 'category__name', 'product_price', 'wholesale_price',
+        'quantity_per_box', 'product_stock', 'wholesale_stock', 'is_new',
+    )
+    for row in products.iterator(chunk_size=chunk_size):
+        yield writer.writerow(['' if value is None else value for value in row])
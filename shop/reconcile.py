@@ -0,0 +1,114 @@
+"""
+Catch-up reconciliation of pending orders against Paystack.
+
+If the webhook for a payment never arrives and the customer doesn't come
+back to ``verify_payment``, the order sits in ``pending`` with the money
+taken.  ``reconcile_pending_orders`` asks Paystack about every pending
+order older than a cutoff and settles the ones it has an answer for.
+
+The verify calls are network-bound, so they run on a bounded thread pool
+sharing the process's pooled session (see shop.paystack).  Workers only
+return an outcome: counting and the database work stay on the calling
+thread, which applies a batch at a time, one transaction per batch.
+Each order still goes through ``mark_order_paid`` / ``fail_order``, so a
+webhook landing at the same moment can't move stock twice.
+"""
+
+import itertools
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import transaction
+
+from . import paystack
+from .models import Order
+from .orders import fail_order, mark_order_paid
+
+
+logger = logging.getLogger(__name__)
+
+
+BATCH_SIZE = 200
+
+# Paystack transaction statuses that settle an order one way or the other.
+# Anything else ('abandoned', 'ongoing', 'pending', ...) is left for the
+# customer to finish or the stale-order sweeper to cancel.
+PAID_STATUSES = {'success'}
+FAILED_STATUSES = {'failed', 'reversed'}
+
+OUTCOMES = ('paid', 'failed', 'open', 'missing', 'error')
+
+
+def pending_orders(created_before, created_after=None):
+    """Pending orders created before ``created_before``, oldest first."""
+    orders = Order.objects.filter(status='pending', created_at__lt=created_before)
+    if created_after is not None:
+        orders = orders.filter(created_at__gte=created_after)
+    return orders.order_by('created_at').only('id', 'order_id', 'order_type', 'paystack_reference')
+
+
+def check_order(order):
+    """Ask Paystack about ``order``; returns one of OUTCOMES."""
+    reference = order.paystack_reference or order.order_id
+    try:
+        response = paystack.verify_transaction(reference)
+    except paystack.PaystackError as e:
+        logger.warning('Could not verify order %s: %s', order.order_id, e)
+        return 'error'
+    if not response.get('status'):
+        # Paystack never saw the reference: initialize didn't get through.
+        return 'missing'
+    status = (response.get('data') or {}).get('status')
+    if status in PAID_STATUSES:
+        return 'paid'
+    if status in FAILED_STATUSES:
+        return 'failed'
+    return 'open'
+
+
+def _apply(results):
+    """Settle a batch of ``(order, outcome)`` in one transaction; returns
+    how many orders actually changed."""
+    changed = 0
+    with transaction.atomic():
+        for order, outcome in results:
+            if outcome == 'paid':
+                changed += mark_order_paid(order)
+            elif outcome == 'failed':
+                changed += fail_order(order)
+    return changed
+
+
+def reconcile_pending_orders(orders, workers=None, batch_size=BATCH_SIZE, dry_run=False, progress=None):
+    """Verify ``orders`` concurrently and settle them a batch at a time.
+
+    Returns a dict of counts per outcome plus ``checked`` and ``changed``.
+    ``progress``, if given, is called with the running counts after each
+    batch.
+    """
+    workers = workers or settings.PAYSTACK_POOL_SIZE
+    counts = dict.fromkeys(OUTCOMES, 0)
+    counts.update(checked=0, changed=0)
+    # Read the selection up front (a few thousand narrow rows at most):
+    # settling orders changes their status, which would shift a cursor
+    # still walking the same filter.
+    orders = iter(list(orders))
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='reconcile') as pool:
+        while True:
+            chunk = list(itertools.islice(orders, batch_size))
+            if not chunk:
+                break
+            futures = {pool.submit(check_order, order): order for order in chunk}
+            results = []
+            for future in as_completed(futures):
+                outcome = future.result()
+                counts[outcome] += 1
+                results.append((futures[future], outcome))
+            counts['checked'] += len(chunk)
+            if not dry_run:
+                counts['changed'] += _apply(results)
+            if progress:
+                progress(counts)
+    return counts
@@ -0,0 +1,198 @@
+"""
+Indexed product search over ``product_name`` and ``product_code``.
+
+* PostgreSQL: ``pg_trgm`` GIN indexes on ``UPPER(column::text)`` for both
+  columns.  That is the exact expression Django's ``icontains`` emits, so
+  the admin search uses them too; ranked search adds the word-similarity
+  operator for typos.
+* SQLite: an FTS5 table using the ``trigram`` tokenizer, kept in sync
+  with ``shop_products`` by triggers.  Candidates come from the index
+  ranked by ``bm25`` and are re-scored with the same trigram similarity
+  pg_trgm uses, so both backends rank alike.
+
+Anything else falls back to plain ``icontains`` scans.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .catalog import STOCK_FIELDS
+from .models import Products
+
+
+TABLE = Products._meta.db_table
+FTS_TABLE = f'{TABLE}_fts'
+
+# FTS candidates sharing less than this share of the query's trigrams
+# are dropped; a little looser than pg_trgm's word_similarity (0.6).
+MIN_SIMILARITY = 0.5
+
+# How many FTS candidates to re-score per requested result.
+CANDIDATE_FACTOR = 10
+
+POSTGRES_INDEX_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    f'CREATE INDEX IF NOT EXISTS shop_products_name_trgm ON {TABLE} USING gin ((UPPER(product_name::text)) gin_trgm_ops)',
+    f'CREATE INDEX IF NOT EXISTS shop_products_code_trgm ON {TABLE} USING gin ((UPPER(product_code::text)) gin_trgm_ops)',
+]
+
+SQLITE_INDEX_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        product_name, product_code, content='{TABLE}', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, product_name, product_code)
+        VALUES (new.id, new.product_name, new.product_code);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, product_name, product_code)
+        VALUES ('delete', old.id, old.product_name, old.product_code);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF product_name, product_code ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, product_name, product_code)
+        VALUES ('delete', old.id, old.product_name, old.product_code);
+        INSERT INTO {FTS_TABLE}(rowid, product_name, product_code)
+        VALUES (new.id, new.product_name, new.product_code);
+    END""",
+]
+
+
+def install_search_index(conn=connection):
+    """Create the search index for ``conn``'s backend if it is missing.
+
+    Safe to run repeatedly.  On SQLite, Django rebuilds a table (and so
+    drops its triggers) when some migrations alter it, so this also runs
+    after every ``migrate`` and rebuilds the FTS table if the triggers
+    had to be recreated.
+    """
+    with conn.cursor() as cursor:
+        if conn.vendor == 'postgresql':
+            for sql in POSTGRES_INDEX_SQL:
+                cursor.execute(sql)
+        elif conn.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+                [f'{FTS_TABLE}_a%'],
+            )
+            complete = cursor.fetchone()[0] == 3
+            for sql in SQLITE_INDEX_SQL:
+                cursor.execute(sql)
+            if not complete:
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def trigrams(text):
+    """pg_trgm-style trigrams: lower-cased words padded with blanks."""
+    grams = set()
+    for word in re.findall(r'\w+', (text or '').lower()):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(query, text):
+    """Share of ``query``'s trigrams found in ``text`` (like word_similarity).
+
+    A case-insensitive substring match always scores 1.0.
+    """
+    if not text:
+        return 0.0
+    if query.lower() in text.lower():
+        return 1.0
+    query_grams = trigrams(query)
+    if not query_grams:
+        return 0.0
+    return len(query_grams & trigrams(text)) / len(query_grams)
+
+
+def _score(query, name, code):
+    return max(similarity(query, name), similarity(query, code))
+
+
+def _stock_condition(mode, alias):
+    if mode is None:
+        return ''
+    return f' AND {alias}.{STOCK_FIELDS[mode]} > 0'
+
+
+def _fts_match(query):
+    """FTS5 expression matching any trigram of ``query`` (typo tolerant)."""
+    grams = {g for g in trigrams(query) if ' ' not in g}
+    return ' OR '.join('"{}"'.format(g.replace('"', '""')) for g in sorted(grams))
+
+
+def _ranked_ids(query, mode, limit):
+    """Return product ids for ``query``, best match first."""
+    vendor = connection.vendor
+    if vendor == 'postgresql':
+        sql = (
+            f'SELECT p.id FROM {TABLE} p '
+            f'WHERE (UPPER(%s) <%% UPPER(p.product_name::text) '
+            f'OR UPPER(p.product_name::text) LIKE UPPER(%s) OR UPPER(p.product_code::text) LIKE UPPER(%s))'
+            f'{_stock_condition(mode, "p")} '
+            f"ORDER BY GREATEST(word_similarity(%s, p.product_name), similarity(%s, coalesce(p.product_code, ''))) DESC, p.id "
+            f'LIMIT %s'
+        )
+        like = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        params = [query, f'%{like}%', f'{like}%', query, query, limit]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+    if vendor == 'sqlite' and _fts_match(query):
+        sql = (
+            f'SELECT p.id, p.product_name, p.product_code FROM {FTS_TABLE} f '
+            f'JOIN {TABLE} p ON p.id = f.rowid '
+            f'WHERE {FTS_TABLE} MATCH %s{_stock_condition(mode, "p")} '
+            f'ORDER BY bm25({FTS_TABLE}) LIMIT %s'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [_fts_match(query), limit * CANDIDATE_FACTOR])
+            rows = cursor.fetchall()
+        scored = [(_score(query, name, code), pk) for pk, name, code in rows]
+        scored = [item for item in scored if item[0] >= MIN_SIMILARITY]
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [pk for _, pk in scored[:limit]]
+
+    # Too short for trigrams, or no index on this backend.
+    queryset = Products.objects.filter(
+        Q(product_name__istartswith=query) | Q(product_name__icontains=f' {query}') |
+        Q(product_code__istartswith=query)
+    )
+    if mode is not None:
+        queryset = queryset.filter(**{f'{STOCK_FIELDS[mode]}__gt': 0})
+    return list(queryset.order_by('product_name', 'id').values_list('id', flat=True)[:limit])
+
+
+def search_products(query, mode=None, limit=20):
+    """Ranked products matching ``query``; ``mode`` limits to in-stock items."""
+    query = query.strip()
+    if not query:
+        return []
+    ids = _ranked_ids(query, mode, limit)
+    products = Products.objects.in_bulk(ids)
+    return [products[pk] for pk in ids if pk in products]
+
+
+def filter_products(queryset, query):
+    """Narrow ``queryset`` to substring matches of ``query`` using the index.
+
+    Used by the admin changelist, which applies its own ordering.
+    """
+    query = query.strip()
+    if not query:
+        return queryset
+    vendor = connection.vendor
+    if vendor == 'postgresql':
+        # icontains compiles to UPPER(col::text) LIKE …, which the
+        # expression indexes above serve.
+        return queryset.filter(Q(product_name__icontains=query) | Q(product_code__icontains=query))
+    if vendor == 'sqlite' and len(query) >= 3:
+        phrase = '"{}"'.format(query.replace('"', '""'))
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [phrase]
+        ))
+    return queryset.filter(Q(product_name__icontains=query) | Q(product_code__icontains=query))
@@ -0,0 +1,21 @@
+from django.db import connections
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .catalog import bump_catalog_version_on_commit
+from .models import Category, Products
+from .search import TABLE, install_search_index
+
+
+@receiver([post_save, post_delete], sender=Products)
+@receiver([post_save, post_delete], sender=Category)
+def catalog_changed(sender, **kwargs):
+    """Any product or category edit invalidates the cached catalog."""
+    bump_catalog_version_on_commit()
+
+
+def search_index_after_migrate(sender, using, **kwargs):
+    """Re-create search triggers that a SQLite table rebuild may have dropped."""
+    connection = connections[using]
+    if TABLE in connection.introspection.table_names():
+        install_search_index(connection)
@@ -1,3 +1,548 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import json
+import os
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest.mock import patch
 
-# Create your tests here.
+import cloudinary
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .archive import ORDER_COLUMNS, archive_orders
+from .catalog import bump_catalog_version, get_catalog_version
+from .catalogue_pdf import build_catalogue_pdf, build_current_pdf, pdf_path
+from .models import ArchivedOrder, ArchivedOrderItem, Category, Products, Order, OrderItem
+from .orders import take_stock
+from .product_io import apply_plan, plan_import, read_sheet
+from .webhooks import process_pending_events
+
+
+class OrderAdminQueryBudgetTests(TestCase):
+    """The order admin pages must cost the same number of queries however
+    many orders, or lines per order, there are."""
+
+    # Session, user, plus the page's own queries.
+    CHANGELIST_QUERIES = 7
+    CHANGE_VIEW_QUERIES = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        categories = [Category.objects.create(name=f'Category {i}') for i in range(3)]
+        cls.products = Products.objects.bulk_create([
+            Products(
+                category=categories[i % len(categories)],
+                product_name=f'Product {i}',
+                product_code=f'P{i}',
+                product_price=10.0,
+                product_stock=100,
+                product_image='image/upload/v1/product',
+            )
+            for i in range(30)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.admin_user)
+        # The admin looks the ContentType up once per process; warm it so
+        # the first request in a test doesn't pay for it.
+        ContentType.objects.get_for_model(Order)
+
+    def make_order(self, lines):
+        order = Order.objects.create(
+            email='shopper@example.com',
+            phone='0200000000',
+            full_name='Shopper',
+            address='Accra',
+            total_amount=Decimal('10.00') * lines,
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, price=Decimal('10.00'))
+            for product in self.products[:lines]
+        ])
+        return order
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_change_view_does_not_grow_with_order_size(self):
+        small = self.make_order(1)
+        large = self.make_order(30)
+        for order in (small, large):
+            with self.subTest(lines=order.items.count()):
+                url = reverse('admin:shop_order_change', args=[order.pk])
+                self.assertEqual(self.count_queries(url), self.CHANGE_VIEW_QUERIES)
+
+    def test_change_view_shows_line_totals(self):
+        order = self.make_order(2)
+        OrderItem.objects.filter(order=order).update(quantity=3)
+        response = self.client.get(reverse('admin:shop_order_change', args=[order.pk]), secure=True)
+        self.assertContains(response, '₵30.00', count=2)
+        self.assertContains(response, 'Product 0 - Category 0')
+
+    def test_changelist_does_not_grow_with_order_count(self):
+        url = reverse('admin:shop_order_changelist')
+        self.make_order(3)
+        self.assertEqual(self.count_queries(url), self.CHANGELIST_QUERIES)
+        for _ in range(20):
+            self.make_order(3)
+        self.assertEqual(self.count_queries(url), self.CHANGELIST_QUERIES)
+
+
+class ArchiveOrdersTests(TestCase):
+    """Closed orders move to the archive whole, or stay where they are."""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Category')
+        cls.product = Products.objects.create(
+            category=category,
+            product_name='Product',
+            product_code='P1',
+            product_price=10.0,
+            product_stock=100,
+            product_image='image/upload/v1/product',
+        )
+
+    def setUp(self):
+        self.cutoff = timezone.now() + timedelta(seconds=1)
+
+    def make_order(self, lines=1, status='failed'):
+        order = Order.objects.create(
+            email='shopper@example.com',
+            phone='0200000000',
+            full_name='Shopper',
+            address='Accra',
+            total_amount=Decimal('10.00') * lines,
+            status=status,
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=self.product, quantity=1, price=Decimal('10.00'))
+            for _ in range(lines)
+        ])
+        return order
+
+    def archive_copy(self, order, **fields):
+        """An archive row for ``order``, as an earlier run (or, with other
+        ``fields``, another order) would have left it."""
+        values = Order.objects.values(*ORDER_COLUMNS).get(pk=order.pk)
+        values.update(fields)
+        return ArchivedOrder.objects.create(**values)
+
+    def test_moves_orders_with_their_items(self):
+        orders = [self.make_order(lines=2) for _ in range(3)]
+        pending = self.make_order(status='pending')
+        self.assertEqual(archive_orders(self.cutoff)[:3], (3, 6, 0))
+        self.assertEqual(list(Order.objects.all()), [pending])
+        self.assertEqual(ArchivedOrderItem.objects.filter(order_id=orders[0].pk).count(), 2)
+
+    def test_reuses_a_copy_left_by_an_earlier_run(self):
+        order = self.make_order(lines=2)
+        copy = self.archive_copy(order)
+        item = order.items.first()
+        ArchivedOrderItem.objects.create(
+            id=item.pk, order=copy, product_id=item.product_id, product_name='Product', quantity=1, price=item.price,
+        )
+        self.assertEqual(archive_orders(self.cutoff)[:3], (1, 2, 0))
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(copy.items.count(), 2)
+
+    def test_order_whose_id_is_taken_stays(self):
+        taken = self.make_order()
+        other = self.archive_copy(taken, order_id=uuid.uuid4(), full_name='Someone else')
+        self.make_order()
+        with self.assertLogs('shop.archive', 'WARNING'):
+            self.assertEqual(archive_orders(self.cutoff)[:3], (1, 1, 1))
+        self.assertEqual(list(Order.objects.all()), [taken])
+        self.assertEqual(taken.items.count(), 1)
+        self.assertFalse(other.items.exists())
+
+    def test_item_collision_leaves_no_partial_copy(self):
+        order = self.make_order(lines=2)
+        other = self.archive_copy(order, id=order.pk + 1000, order_id=uuid.uuid4())
+        ArchivedOrderItem.objects.create(
+            id=order.items.first().pk, order=other, product_id=self.product.pk, product_name='Product',
+            quantity=1, price=Decimal('10.00'),
+        )
+        with self.assertLogs('shop.archive', 'WARNING'):
+            self.assertEqual(archive_orders(self.cutoff)[:3], (0, 0, 1))
+        self.assertFalse(ArchivedOrder.objects.filter(pk=order.pk).exists())
+        self.assertEqual(order.items.count(), 2)
+        self.assertEqual(ArchivedOrderItem.objects.count(), 1)
+
+    def test_skipped_orders_do_not_stall_the_sweep(self):
+        taken = [self.make_order() for _ in range(2)]
+        for order in taken:
+            self.archive_copy(order, order_id=uuid.uuid4())
+        rest = [self.make_order() for _ in range(3)]
+        out = StringIO()
+        with self.assertLogs('shop.archive', 'WARNING'):
+            call_command('sweep_orders', retention_days=0, batch_size=2, stdout=out)
+        self.assertEqual(list(Order.objects.order_by('id')), taken)
+        self.assertEqual(ArchivedOrder.objects.filter(pk__in=[order.pk for order in rest]).count(), 3)
+        self.assertIn('Skipped 2 orders', out.getvalue())
+
+
+class ProductImportTests(TestCase):
+    """Sheet imports change only what the sheet says, and never overwrite
+    a value that moved after the preview."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        category = Category.objects.create(name='Category')
+        Products.objects.bulk_create([
+            Products(
+                category=category,
+                product_name=f'Product {i}',
+                product_code=f'P{i}',
+                product_price=10.0,
+                product_stock=100,
+                product_image='image/upload/v1/product',
+            )
+            for i in range(3)
+        ])
+
+    def plan(self, text):
+        return plan_import(read_sheet(BytesIO(text.encode()), 'stock.csv'))
+
+    def test_blank_cell_leaves_value_alone(self):
+        plan = self.plan('product_code,product_price,product_stock\nP0,,50\n')
+        self.assertEqual(plan['errors'], [])
+        self.assertEqual(plan['changes'][0]['changes'], {'product_stock': (100, 50)})
+
+    def test_bad_number_is_reported(self):
+        plan = self.plan('product_code,product_price\nP0,ten\n')
+        self.assertEqual(plan['changes'], [])
+        self.assertEqual(plan['errors'], [(2, 'P0', "product_price must be a number, not 'ten'")])
+
+    def test_duplicate_and_unknown_codes_are_reported(self):
+        plan = self.plan('product_code,product_stock\nP0,1\nP0,2\nNOPE,3\n')
+        self.assertEqual(plan['errors'], [(3, 'P0', 'Duplicate of row 2'), (4, 'NOPE', 'No product with this code')])
+        self.assertEqual(plan['changes'][0]['changes'], {'product_stock': (100, 1)})
+
+    def test_apply_updates_and_bumps_catalog_version(self):
+        plan = self.plan('product_code,product_price,product_stock\nP0,12.50,\nP1,,7\nP2,10,100\n')
+        self.assertEqual(plan['unchanged'], 1)
+        version = get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(apply_plan(plan), (2, []))
+        self.assertNotEqual(get_catalog_version(), version)
+        self.assertEqual(Products.objects.get(product_code='P0').product_price, 12.5)
+        self.assertEqual(Products.objects.get(product_code='P1').product_stock, 7)
+
+    def test_stock_moved_since_preview_is_not_overwritten(self):
+        plan = self.plan('product_code,product_stock\nP0,50\nP1,50\n')
+        take_stock(Products.objects.get(product_code='P0').pk, 1)
+        updated, conflicts = apply_plan(plan)
+        self.assertEqual(updated, 1)
+        self.assertEqual(conflicts, [('P0', 'product_stock is now 99, was 100 in the preview')])
+        self.assertEqual(Products.objects.get(product_code='P0').product_stock, 99)
+        self.assertEqual(Products.objects.get(product_code='P1').product_stock, 50)
+
+    def test_admin_warns_about_conflicts(self):
+        self.client.force_login(self.admin_user)
+        url = reverse('admin:shop_products_import')
+        upload = SimpleUploadedFile('stock.csv', b'product_code,product_stock\nP0,50\n')
+        response = self.client.post(url, {'file': upload}, secure=True)
+        self.assertEqual(len(response.context['preview']), 1)
+        take_stock(Products.objects.get(product_code='P0').pk, 1)
+        response = self.client.post(url, {'plan': response.context['token']}, secure=True, follow=True)
+        messages = [str(message) for message in response.context['messages']]
+        self.assertIn('Updated 0 products', messages[0])
+        self.assertIn('Skipped 1 product changed since the preview (P0)', messages[1])
+
+
+# ── Performance budgets ──────────────────────────────────────
+#
+# Query counts are exact ceilings: a view that gains a query (or an N+1
+# in a template) fails here first.  Wall-clock budgets are deliberately
+# coarse, catching order-of-magnitude regressions rather than noise;
+# PERF_BUDGET_SCALE stretches them on slow machines.  No test touches the
+# network: Paystack is replaced by FakePaystack, Cloudinary gets a test
+# cloud name (URLs are built locally) and any outbound HTTP fails the
+# test.
+
+TIME_SCALE = float(os.environ.get('PERF_BUDGET_SCALE', 1))
+
+PERF_SETTINGS = {
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    'PAYSTACK_SECRET_KEY': 'sk_test_budget',
+    'STOCK_RESERVATION_TTL': 0,
+    'SLOW_REQUEST_SECONDS': 60,
+}
+
+
+def seed_catalog(categories, per_category, stock=1000):
+    """Bulk-insert ``categories`` x ``per_category`` products (no Cloudinary)."""
+    cats = Category.objects.bulk_create([Category(name=f'Category {i:02}') for i in range(categories)])
+    Products.objects.bulk_create(
+        (
+            Products(
+                category=category,
+                product_name=f'{category.name} item {n}',
+                product_code=f'C{category.pk}-{n}',
+                product_price=12.5,
+                wholesale_price=10.0,
+                quantity_per_box=12,
+                product_stock=stock,
+                wholesale_stock=stock // 10,
+                product_image='image/upload/v1/product',
+            )
+            for category in cats
+            for n in range(per_category)
+        ),
+        batch_size=2000,
+    )
+    return cats
+
+
+class FakePaystack:
+    """Stands in for ``shop.paystack._call``: every transaction succeeds."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, operation, method, path, **kwargs):
+        self.calls.append(operation)
+        if operation == 'initialize':
+            reference = kwargs['json']['reference']
+            return {'status': True, 'data': {
+                'authorization_url': f'https://checkout.paystack.test/{reference}',
+                'access_code': 'test', 'reference': reference,
+            }}
+        reference = path.rsplit('/', 1)[-1]
+        return {'status': True, 'data': {'status': 'success', 'reference': reference}}
+
+
+def _no_network(*args, **kwargs):
+    raise AssertionError('Tests must not make network calls')
+
+
+@override_settings(**PERF_SETTINGS)
+class PerformanceBudgetTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.paystack = FakePaystack()
+        for target, replacement in (
+            ('shop.paystack._call', self.paystack),
+            # Under both requests (Paystack) and the Cloudinary SDK.
+            ('urllib3.connectionpool.HTTPConnectionPool.urlopen', _no_network),
+        ):
+            patcher = patch(target, replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # Whatever the environment has (settings default to none).
+        patcher = patch.object(cloudinary.config(), 'cloud_name', 'test')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assertWithinBudget(self, queries, seconds, func, *args, **kwargs):
+        """Run ``func`` and check its query count and wall-clock time."""
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            result = func(*args, **kwargs)
+            elapsed = time.perf_counter() - started
+        self.assertLessEqual(
+            len(captured), queries,
+            '\n'.join([f'{len(captured)} queries, budget {queries}:'] + [q['sql'] for q in captured]),
+        )
+        self.assertLessEqual(elapsed, seconds * TIME_SCALE, f'took {elapsed:.3f}s, budget {seconds}s')
+        return result
+
+    def get(self, url, **kwargs):
+        return self.client.get(url, secure=True, **kwargs)
+
+    def post_json(self, url, payload, **kwargs):
+        return self.client.post(url, json.dumps(payload), content_type='application/json', secure=True, **kwargs)
+
+
+class StorefrontBudgetTests(PerformanceBudgetTestCase):
+    """The storefront against a realistic catalog: 50 categories x 2,000."""
+
+    CATEGORIES = 50
+    PER_CATEGORY = 2000
+
+    # Cold: the category tabs.  Warm: the rendered page comes from cache.
+    PAGE_COLD_QUERIES = 1
+    PAGE_WARM_QUERIES = 0
+    CATALOG_PAGE_QUERIES = 1
+    GET_PRODUCT_QUERIES = 1
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories = seed_catalog(cls.CATEGORIES, cls.PER_CATEGORY)
+        cls.product = Products.objects.order_by('id').first()
+
+    def check_storefront(self, url):
+        response = self.assertWithinBudget(self.PAGE_COLD_QUERIES, 1.0, self.get, url)
+        self.assertEqual(response.status_code, 200)
+        for category in (self.categories[0], self.categories[-1]):
+            self.assertContains(response, category.name)
+        response = self.assertWithinBudget(self.PAGE_WARM_QUERIES, 0.2, self.get, url)
+        self.assertEqual(response.status_code, 200)
+        response = self.assertWithinBudget(0, 0.2, self.get, url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_index(self):
+        self.check_storefront(reverse('shop-retail'))
+
+    def test_wholesale(self):
+        self.check_storefront(reverse('shop-wholesale'))
+
+    def test_catalog_page(self):
+        url = f"{reverse('catalog-api')}?category={self.categories[-1].pk}&limit=100"
+        response = self.assertWithinBudget(self.CATALOG_PAGE_QUERIES, 0.5, self.get, url)
+        self.assertEqual(len(response.json()['products']), 100)
+        self.assertWithinBudget(0, 0.1, self.get, url)
+
+    def test_get_product(self):
+        url = reverse('get-product', args=[self.product.pk])
+        response = self.assertWithinBudget(self.GET_PRODUCT_QUERIES, 0.2, self.get, url)
+        self.assertEqual(response.json()['product']['id'], self.product.pk)
+        self.assertTrue(response.json()['product']['image'].startswith('https://res.cloudinary.com/test/'))
+
+
+class CheckoutBudgetTests(PerformanceBudgetTestCase):
+    """create_order costs the same whatever the cart size; settling a
+    payment costs a fixed amount plus a bounded amount per cart line."""
+
+    CART_LINES = 100
+
+    CREATE_ORDER_QUERIES = 6
+    # Per line: the conditional stock UPDATE plus the product rollup
+    # upsert, which on a product's first sale of the day is an UPDATE,
+    # then an INSERT inside a savepoint (see shop.orders, shop.analytics).
+    SETTLE_BASE_QUERIES = 17
+    SETTLE_QUERIES_PER_LINE = 5
+    WEBHOOK_QUERIES = 1
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_catalog(2, cls.CART_LINES)
+        cls.products = list(Products.objects.order_by('id')[:cls.CART_LINES])
+
+    def checkout(self, lines):
+        return self.post_json(reverse('create-order'), {
+            'cart': [{'id': p.pk, 'quantity': 2} for p in self.products[:lines]],
+            'email': 'shopper@example.com',
+            'full_name': 'Shopper',
+            'phone': '0200000000',
+            'address': 'Accra',
+        })
+
+    def settle_budget(self, lines):
+        return self.SETTLE_BASE_QUERIES + self.SETTLE_QUERIES_PER_LINE * lines
+
+    def test_create_order(self):
+        for lines in (1, self.CART_LINES):
+            with self.subTest(lines=lines):
+                response = self.assertWithinBudget(self.CREATE_ORDER_QUERIES, 1.0, self.checkout, lines)
+                self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.paystack.calls, ['initialize', 'initialize'])
+        self.assertEqual(Order.objects.get(order_id=response.json()['order_id']).items.count(), self.CART_LINES)
+
+    def test_verify_payment(self):
+        reference = self.checkout(self.CART_LINES).json()['reference']
+        url = reverse('verify-payment')
+        response = self.assertWithinBudget(
+            self.settle_budget(self.CART_LINES), 2.0, self.post_json, url, {'reference': reference},
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(Order.objects.get(order_id=reference).status, 'paid')
+        self.assertEqual(Products.objects.get(pk=self.products[0].pk).product_stock, 998)
+
+    def test_webhook(self):
+        reference = self.checkout(self.CART_LINES).json()['reference']
+        body = json.dumps({'event': 'charge.success', 'data': {'id': 1, 'reference': reference}}).encode()
+        signature = hmac.new(b'sk_test_budget', body, hashlib.sha512).hexdigest()
+        response = self.assertWithinBudget(
+            self.WEBHOOK_QUERIES, 0.2, self.client.post, reverse('paystack-webhook'), body,
+            content_type='application/json', secure=True, HTTP_X_PAYSTACK_SIGNATURE=signature,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Order.objects.get(order_id=reference).status, 'pending')
+
+        # Claiming and finishing the event, on top of settling the order.
+        processed, failed = self.assertWithinBudget(
+            self.settle_budget(self.CART_LINES) + 6, 2.0, process_pending_events,
+        )
+        self.assertEqual((processed, failed), (1, 0))
+        self.assertEqual(Order.objects.get(order_id=reference).status, 'paid')
+
+
+class CataloguePdfBudgetTests(PerformanceBudgetTestCase):
+    """The catalogue PDF is built with one query, once per catalog
+    version, and served from disk."""
+
+    BUILD_QUERIES = 1
+    # Session and user.
+    DOWNLOAD_QUERIES = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        seed_catalog(10, 100)
+
+    def setUp(self):
+        super().setUp()
+        pdf_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(pdf_dir.cleanup)
+        override = override_settings(CATALOGUE_PDF_DIR=pdf_dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client.force_login(self.admin_user)
+
+    def download(self, queries):
+        with patch('shop.catalogue_pdf.threading.Thread') as thread:
+            response = self.assertWithinBudget(
+                queries, 0.5, self.get, reverse('admin:shop_products_download_pdf'),
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        response.close()
+        return thread
+
+    def test_build(self):
+        stats = self.assertWithinBudget(self.BUILD_QUERIES, 15.0, build_catalogue_pdf, pdf_path('test'))
+        self.assertEqual(stats['products'], 1000)
+
+    def test_download(self):
+        self.assertIsNotNone(build_current_pdf())
+        self.download(self.DOWNLOAD_QUERIES).assert_not_called()
+
+    def test_stock_change_rebuilds_pdf(self):
+        # The PDF prints stock, so a sale makes it out of date.
+        build_current_pdf()
+        take_stock(Products.objects.order_by('id').values_list('id', flat=True).first(), 1)
+        bump_catalog_version()
+        with override_settings(CATALOGUE_PDF_REBUILD_INTERVAL=0):
+            thread = self.download(self.DOWNLOAD_QUERIES)
+        thread.assert_called_once()
+        self.assertEqual(thread.call_args.kwargs['args'], (pdf_path(get_catalog_version()),))
+
+    def test_rebuilds_are_spaced_out(self):
+        build_current_pdf()
+        Products.objects.filter(pk=Products.objects.order_by('id').values('id')[:1]).update(product_price=99)
+        bump_catalog_version()
+        # Just built: the old file is served and no rebuild starts yet.
+        self.download(self.DOWNLOAD_QUERIES).assert_not_called()
+        with override_settings(CATALOGUE_PDF_REBUILD_INTERVAL=0):
+            self.download(self.DOWNLOAD_QUERIES).assert_called_once()
@@ -1,18 +1,27 @@
+from django.conf import settings
 from django.urls import path 
-from .views import debug_cloudinary, health_check, landing, index, wholesale, get_product, create_order, verify_payment, paystack_webhook
+from . import async_views, views
+from .views import health_check, readiness, metrics_endpoint, landing, search_api, get_product
 
+# Under the ASGI profile the catalog, checkout and webhook endpoints are
+# served by their async versions (see shop.async_views).
+live = async_views if settings.ASYNC_VIEWS else views
 
 
 urlpatterns = [
     path('', landing, name='shop-landing'),
     path('health/', health_check, name='health-check'),
-    path('retail/', index, name='shop-retail'),
-    path('wholesale/', wholesale, name='shop-wholesale'),
+    path('ready/', readiness, name='readiness'),
+    path('metrics', metrics_endpoint, name='metrics'),
+    path('retail/', live.index, name='shop-retail'),
+    path('wholesale/', live.wholesale, name='shop-wholesale'),
+    path('api/catalog/', live.catalog_api, name='catalog-api'),
+    path('api/search/', search_api, name='search-api'),
     path('api/product/<int:product_id>/', get_product, name='get-product'),
-    path('api/create-order/', create_order, name='create-order'),
-    path('api/verify-payment/', verify_payment, name='verify-payment'),
-    path('api/paystack-webhook/', paystack_webhook, name='paystack-webhook'),
-    path('debug/', debug_cloudinary, name='debug'),
+    path('api/products/', live.get_products, name='get-products'),
+    path('api/create-order/', live.create_order, name='create-order'),
+    path('api/verify-payment/', live.verify_payment, name='verify-payment'),
+    path('api/paystack-webhook/', live.paystack_webhook, name='paystack-webhook'),
 ]
 
 
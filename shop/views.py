@@ -1,19 +1,53 @@
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, etag, require_GET, require_POST
 from django.conf import settings
-from django.db.models import Prefetch
-from .models import Category, Products, Order, OrderItem
+from .catalog import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, STOCK_FIELDS,
+    get_catalog_version, get_product_page, get_rendered_page,
+    product_entry,
+)
+from .models import Products, Order
+from .health import liveness_response, readiness_response
+from .idempotency import idempotent
+from .orders import OrderError, create_pending_order, fail_order, mark_order_paid
+from . import metrics, paystack
+from .search import search_products
+from .webhooks import SIGNATURE_HEADER, record_event, signature_is_valid
+import hashlib
 import json
-import requests
 import uuid
 
+# Upper bound on ids accepted by the batch product lookup.
+MAX_BATCH_PRODUCTS = 200
+MAX_SEARCH_LENGTH = 100
+
 # Create your views here.
 
 def health_check(request):
-    """Lightweight health check to keep Render from spinning down."""
-    return JsonResponse({'status': 'ok'})
+    """Lightweight health check to keep Render from spinning down.
+
+    Normally answered by shop.health.HealthCheckMiddleware before the
+    request gets this far.
+    """
+    return liveness_response()
+
+
+def readiness(request):
+    """Database and cache status for monitoring (see shop.health)."""
+    return readiness_response()
+
+
+def metrics_endpoint(request):
+    """Prometheus scrape endpoint (see shop.metrics)."""
+    if not metrics.is_authorized(request):
+        response = HttpResponse('Unauthorized', status=401, content_type='text/plain')
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    body, content_type = metrics.render()
+    return HttpResponse(body, content_type=content_type)
 
 
 def landing(request):
@@ -21,33 +55,61 @@ def landing(request):
     return render(request, 'html/landing.html')
 
 
+def _storefront_etag(mode):
+    def etag_func(request):
+        return f'{mode}-{get_catalog_version()}-{settings.BUILD_ID}'
+    return etag_func
+
+
+# The storefront pages only change with the catalog, so returning
+# visitors (and the keep-alive pinger) revalidate and usually get a 304
+# without the page being looked up or rendered.
+@cache_control(no_cache=True)
+@condition(etag_func=_storefront_etag('retail'))
 def index(request):
     """Retail shop page."""
-    # Only show products that are in stock (stock > 0)
-    in_stock_products = Prefetch(
-        'products_set',
-        queryset=Products.objects.filter(product_stock__gt=0)
-    )
-    categories = Category.objects.prefetch_related(in_stock_products).all()
-    context = {
-        'categories': categories,
-        'paystack_public_key': settings.PAYSTACK_PUBLIC_KEY,
-    }
-    return render(request, 'html/index.html', context)
+    # Only in-stock products are listed; see shop.catalog for the cache.
+    return HttpResponse(get_rendered_page('retail', 'html/index.html'))
 
 
+@cache_control(no_cache=True)
+@condition(etag_func=_storefront_etag('wholesale'))
 def wholesale(request):
     """Wholesale page – bulk purchasing."""
-    in_stock_products = Prefetch(
-        'products_set',
-        queryset=Products.objects.filter(wholesale_stock__gt=0)
+    return HttpResponse(get_rendered_page('wholesale', 'html/wholesale.html'))
+
+
+def _catalog_params(request):
+    """Parse catalog_api's query; returns ``(params, None)`` or ``(None, error)``."""
+    mode = request.GET.get('mode', 'retail')
+    if mode not in STOCK_FIELDS:
+        return None, JsonResponse({'success': False, 'error': 'Invalid mode'}, status=400)
+    try:
+        category_id = int(request.GET['category'])
+        after = int(request.GET.get('after', 0))
+        limit = int(request.GET.get('limit', DEFAULT_PAGE_SIZE))
+    except (KeyError, ValueError):
+        return None, JsonResponse({'success': False, 'error': 'Invalid category, after or limit'}, status=400)
+    return (mode, category_id, after, max(1, min(limit, MAX_PAGE_SIZE))), None
+
+
+def _catalog_response(page):
+    return JsonResponse(
+        {'success': True, **page},
+        json_dumps_params={'separators': (',', ':')},
     )
-    categories = Category.objects.prefetch_related(in_stock_products).all()
-    context = {
-        'categories': categories,
-        'paystack_public_key': settings.PAYSTACK_PUBLIC_KEY,
-    }
-    return render(request, 'html/wholesale.html', context)
+
+
+def catalog_api(request):
+    """Keyset-paginated products for one category tab.
+
+    Query params: ``category`` (required), ``mode`` (retail|wholesale),
+    ``after`` (last product id already shown) and ``limit``.
+    """
+    params, error = _catalog_params(request)
+    if error:
+        return error
+    return _catalog_response(get_product_page(*params))
 
 
 def get_product(request, product_id):
@@ -60,7 +122,7 @@ def get_product(request, product_id):
                 'id': product.id,
                 'name': product.product_name,
                 'price': float(product.product_price),
-                'image': product.product_image.url,
+                'image': product.media_url('card'),
                 'stock': product.product_stock,
             }
         })
@@ -68,117 +130,187 @@ def get_product(request, product_id):
         return JsonResponse({'success': False, 'error': 'Product not found'}, status=404)
 
 
+def search_api(request):
+    """Ranked product search: ``?q=...&mode=retail|wholesale&limit=...``."""
+    query = request.GET.get('q', '').strip()
+    mode = request.GET.get('mode') or None
+    if mode is not None and mode not in STOCK_FIELDS:
+        return JsonResponse({'success': False, 'error': 'Invalid mode'}, status=400)
+    if len(query) > MAX_SEARCH_LENGTH:
+        return JsonResponse({'success': False, 'error': 'Search term too long'}, status=400)
+    try:
+        limit = max(1, min(int(request.GET.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid limit'}, status=400)
+
+    products = search_products(query, mode, limit)
+    return JsonResponse(
+        {'success': True, 'products': [product_entry(p) for p in products]},
+        json_dumps_params={'separators': (',', ':')},
+    )
+
+
+def _parse_product_ids(request):
+    """Return the unique ids from ``?ids=1,2,3``, or None if invalid."""
+    try:
+        ids = [int(i) for i in request.GET.get('ids', '').split(',') if i.strip()]
+    except ValueError:
+        return None
+    ids = list(dict.fromkeys(ids))
+    if not ids or len(ids) > MAX_BATCH_PRODUCTS:
+        return None
+    return ids
+
+
+def _products_etag(request):
+    """ETag for a batch lookup: the catalog version and build plus the
+    requested ids.
+
+    Any product edit or stock change bumps the catalog version, so an
+    unchanged cart can be answered with a 304 without touching the DB.
+    """
+    ids = _parse_product_ids(request)
+    if ids is None:
+        return None
+    digest = hashlib.md5(','.join(map(str, sorted(ids))).encode(), usedforsecurity=False).hexdigest()
+    return f'{get_catalog_version()}-{settings.BUILD_ID}-{digest}'
+
+
+@require_GET
+@cache_control(no_cache=True)
+@etag(_products_etag)
+def get_products(request):
+    """Batch product details for refreshing a saved cart (``?ids=1,2,3``)."""
+    ids = _parse_product_ids(request)
+    if ids is None:
+        return _bad_product_ids()
+    return _products_response(ids, Products.objects.in_bulk(ids))
+
+
+def _bad_product_ids():
+    return JsonResponse({
+        'success': False,
+        'error': f'Provide between 1 and {MAX_BATCH_PRODUCTS} comma-separated product ids'
+    }, status=400)
+
+
+def _products_response(ids, products):
+    return JsonResponse({
+        'success': True,
+        'products': [product_entry(products[i]) for i in ids if i in products],
+        'missing': [i for i in ids if i not in products],
+    }, json_dumps_params={'separators': (',', ':')})
+
+
+def _parse_checkout(request):
+    """Validate a create_order body; returns ``(details, None)`` or
+    ``(None, error)``.  Raises JSONDecodeError for a malformed body."""
+    data = json.loads(request.body)
+    
+    # Validate cart items
+    cart_items = data.get('cart', [])
+    if not cart_items:
+        return None, JsonResponse({'success': False, 'error': 'Cart is empty'}, status=400)
+    
+    # Validate required fields
+    email = data.get('email')
+    full_name = data.get('full_name')
+    phone = data.get('phone')
+    address = data.get('address')
+    
+    if not all([email, full_name, phone, address]):
+        return None, JsonResponse({'success': False, 'error': 'All fields are required'}, status=400)
+    
+    # Which storefront the order came from, for the sales reports
+    order_type = data.get('order_type', 'retail')
+    if order_type not in dict(Order.ORDER_TYPE_CHOICES):
+        return None, JsonResponse({'success': False, 'error': 'Invalid order type'}, status=400)
+    
+    return {
+        'cart_items': cart_items,
+        'email': email,
+        'phone': phone,
+        'full_name': full_name,
+        'address': address,
+        'order_type': order_type,
+        'callback_url': data.get('callback_url', request.build_absolute_uri('/')),
+    }, None
+
+
+def _start_order(details):
+    """Create the pending order; returns ``(order, None)`` or ``(None, error)``."""
+    try:
+        order = create_pending_order(
+            details['cart_items'], details['email'], details['phone'], details['full_name'],
+            details['address'], details['order_type'],
+        )
+    except OrderError as e:
+        return None, JsonResponse({'success': False, 'error': str(e)}, status=400)
+    return order, None
+
+
+def _paystack_payload(order, details):
+    # Amount in kobo (multiply by 100)
+    return {
+        'email': details['email'],
+        'amount': int(order.total_amount * 100),
+        'reference': str(order.order_id),
+        'callback_url': details['callback_url'],
+        'metadata': {
+            'order_id': str(order.order_id),
+            'customer_name': details['full_name'],
+            'phone': details['phone']
+        }
+    }
+
+
+def _paystack_unavailable(error):
+    return JsonResponse({'success': False, 'error': f'Payment service unavailable: {str(error)}'}, status=503)
+
+
+def _payment_started(order, paystack_response):
+    """Record Paystack's answer to initialize and build the response."""
+    if paystack_response.get('status'):
+        # A targeted UPDATE so a webhook that already marked the order
+        # paid isn't overwritten by this (stale) instance.
+        Order.objects.filter(pk=order.pk).update(paystack_reference=paystack_response['data']['reference'])
+        
+        return JsonResponse({
+            'success': True,
+            'authorization_url': paystack_response['data']['authorization_url'],
+            'access_code': paystack_response['data']['access_code'],
+            'reference': paystack_response['data']['reference'],
+            'order_id': str(order.order_id)
+        })
+    else:
+        fail_order(order)
+        return JsonResponse({
+            'success': False, 
+            'error': paystack_response.get('message', 'Payment initialization failed')
+        }, status=400)
+
+
 @csrf_exempt
 @require_POST
+@idempotent('create_order')
 def create_order(request):
     """Create order and initialize Paystack payment"""
     try:
-        data = json.loads(request.body)
-        
-        # Validate cart items
-        cart_items = data.get('cart', [])
-        if not cart_items:
-            return JsonResponse({'success': False, 'error': 'Cart is empty'}, status=400)
-        
-        # Validate required fields
-        email = data.get('email')
-        full_name = data.get('full_name')
-        phone = data.get('phone')
-        address = data.get('address')
-        
-        if not all([email, full_name, phone, address]):
-            return JsonResponse({'success': False, 'error': 'All fields are required'}, status=400)
-        
-        # Calculate total and validate products
-        total = 0
-        order_items_data = []
-        
-        for item in cart_items:
-            try:
-                product = Products.objects.get(id=item['id'])
-                quantity = int(item['quantity'])
-                
-                if quantity > product.product_stock:
-                    return JsonResponse({
-                        'success': False, 
-                        'error': f'{product.product_name} only has {product.product_stock} in stock'
-                    }, status=400)
-                
-                item_total = float(product.product_price) * quantity
-                total += item_total
-                order_items_data.append({
-                    'product': product,
-                    'quantity': quantity,
-                    'price': product.product_price
-                })
-            except Products.DoesNotExist:
-                return JsonResponse({'success': False, 'error': f'Product with ID {item.get("id")} not found'}, status=400)
-        
-        # Create order
-        order = Order.objects.create(
-            email=email,
-            phone=phone,
-            full_name=full_name,
-            address=address,
-            total_amount=total,
-            status='pending'
-        )
-        
-        # Create order items
-        for item_data in order_items_data:
-            OrderItem.objects.create(
-                order=order,
-                product=item_data['product'],
-                quantity=item_data['quantity'],
-                price=item_data['price']
-            )
+        details, error = _parse_checkout(request)
+        if error:
+            return error
+        order, error = _start_order(details)
+        if error:
+            return error
         
         # Initialize Paystack transaction
-        paystack_url = 'https://api.paystack.co/transaction/initialize'
-        headers = {
-            'Authorization': f'Bearer {settings.PAYSTACK_SECRET_KEY}',
-            'Content-Type': 'application/json'
-        }
-        
-        # Amount in kobo (multiply by 100)
-        paystack_data = {
-            'email': email,
-            'amount': int(total * 100),
-            'reference': str(order.order_id),
-            'callback_url': data.get('callback_url', request.build_absolute_uri('/')),
-            'metadata': {
-                'order_id': str(order.order_id),
-                'customer_name': full_name,
-                'phone': phone
-            }
-        }
-        
         try:
-            response = requests.post(paystack_url, json=paystack_data, headers=headers, timeout=30)
-            paystack_response = response.json()
-        except requests.exceptions.RequestException as e:
-            order.status = 'failed'
-            order.save()
-            return JsonResponse({'success': False, 'error': f'Payment service unavailable: {str(e)}'}, status=503)
+            paystack_response = paystack.initialize_transaction(_paystack_payload(order, details))
+        except paystack.PaystackError as e:
+            fail_order(order)
+            return _paystack_unavailable(e)
         
-        if paystack_response.get('status'):
-            order.paystack_reference = paystack_response['data']['reference']
-            order.save()
-            
-            return JsonResponse({
-                'success': True,
-                'authorization_url': paystack_response['data']['authorization_url'],
-                'access_code': paystack_response['data']['access_code'],
-                'reference': paystack_response['data']['reference'],
-                'order_id': str(order.order_id)
-            })
-        else:
-            order.status = 'failed'
-            order.save()
-            return JsonResponse({
-                'success': False, 
-                'error': paystack_response.get('message', 'Payment initialization failed')
-            }, status=400)
+        return _payment_started(order, paystack_response)
             
     except json.JSONDecodeError:
         return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
@@ -186,55 +318,57 @@ def create_order(request):
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
 
+def _parse_reference(request):
+    """Return ``(reference, None)`` or ``(None, error)``; raises
+    JSONDecodeError for a malformed body."""
+    reference = json.loads(request.body).get('reference')
+    if not reference:
+        return None, JsonResponse({'success': False, 'error': 'Reference required'}, status=400)
+    return reference, None
+
+
+def _payment_verified(reference, paid):
+    """Settle the order for a verified ``reference`` and build the response."""
+    if paid:
+        # Update order status
+        try:
+            order = Order.objects.get(order_id=reference)
+            
+            # Takes the stock only if this call is the one that marks
+            # the order paid (the webhook may have got there first)
+            mark_order_paid(order)
+            
+            return JsonResponse({
+                'success': True,
+                'message': 'Payment verified successfully',
+                'order_id': str(order.order_id),
+                'amount': float(order.total_amount)
+            })
+        except Order.DoesNotExist:
+            return JsonResponse({'success': False, 'error': 'Order not found'}, status=404)
+    else:
+        return JsonResponse({
+            'success': False, 
+            'error': 'Payment verification failed'
+        }, status=400)
+
+
 @csrf_exempt
 @require_POST
 def verify_payment(request):
     """Verify Paystack payment"""
     try:
-        data = json.loads(request.body)
-        reference = data.get('reference')
-        
-        if not reference:
-            return JsonResponse({'success': False, 'error': 'Reference required'}, status=400)
+        reference, error = _parse_reference(request)
+        if error:
+            return error
         
         # Verify with Paystack
-        paystack_url = f'https://api.paystack.co/transaction/verify/{reference}'
-        headers = {
-            'Authorization': f'Bearer {settings.PAYSTACK_SECRET_KEY}',
-        }
-        
-        response = requests.get(paystack_url, headers=headers)
-        paystack_response = response.json()
+        try:
+            paid = paystack.charge_succeeded(reference)
+        except paystack.PaystackError as e:
+            return _paystack_unavailable(e)
         
-        if paystack_response.get('status') and paystack_response['data']['status'] == 'success':
-            # Update order status
-            try:
-                order = Order.objects.get(order_id=reference)
-                
-                # Only update stock if order wasn't already paid (prevent double reduction)
-                if order.status != 'paid':
-                    order.status = 'paid'
-                    order.save()
-                    
-                    # Reduce product stock by quantity purchased
-                    for item in order.items.all():
-                        product = item.product
-                        product.product_stock -= item.quantity
-                        product.save()
-                
-                return JsonResponse({
-                    'success': True,
-                    'message': 'Payment verified successfully',
-                    'order_id': str(order.order_id),
-                    'amount': float(order.total_amount)
-                })
-            except Order.DoesNotExist:
-                return JsonResponse({'success': False, 'error': 'Order not found'}, status=404)
-        else:
-            return JsonResponse({
-                'success': False, 
-                'error': 'Payment verification failed'
-            }, status=400)
+        return _payment_verified(reference, paid)
             
     except json.JSONDecodeError:
         return JsonResponse({'success': False, 'error': 'Invalid JSON'}, status=400)
@@ -243,51 +377,29 @@ def verify_payment(request):
 
 
 @csrf_exempt
+@require_POST
 def paystack_webhook(request):
-    """Handle Paystack webhooks"""
-    if request.method == 'POST':
-        try:
-            data = json.loads(request.body)
-            event = data.get('event')
-            
-            if event == 'charge.success':
-                reference = data['data']['reference']
-                try:
-                    order = Order.objects.get(order_id=reference)
-                    if order.status != 'paid':
-                        order.status = 'paid'
-                        order.save()
-                        
-                        # Update product stock
-                        for item in order.items.all():
-                            item.product.product_stock -= item.quantity
-                            item.product.save()
-                except Order.DoesNotExist:
-                    pass
-                    
-            return JsonResponse({'status': 'ok'})
-        except:
-            return JsonResponse({'status': 'error'}, status=400)
-    
-    return JsonResponse({'status': 'method not allowed'}, status=405)
-
-
+    """Receive Paystack webhooks.
 
+    Only verifies and stores the event; ``manage.py process_webhooks``
+    applies it (see shop.webhooks).
+    """
+    data, error = _parse_webhook(request)
+    if error:
+        return error
+    record_event(data, request.body)
+    return JsonResponse({'status': 'ok'})
 
 
-def debug_cloudinary(request):
-    """Temporary debug view - DELETE AFTER TESTING"""
-    from django.http import JsonResponse
-    from django.conf import settings
-    from .models import Products
-    
-    return JsonResponse({
-        'cloud_name': settings.CLOUDINARY_STORAGE.get('CLOUD_NAME', 'NOT SET'),
-        'api_key_set': bool(settings.CLOUDINARY_STORAGE.get('API_KEY')),
-        'api_secret_set': bool(settings.CLOUDINARY_STORAGE.get('API_SECRET')),
-        'default_storage': getattr(settings, 'DEFAULT_FILE_STORAGE', 'NOT SET'),
-        'products': [
-            {'name': p.product_name, 'image_url': p.product_image.url if p.product_image else None}
-            for p in Products.objects.all()[:3]
-        ]
-    })
\ No newline at end of file
+def _parse_webhook(request):
+    """Check a webhook's signature and body; returns ``(event, None)`` or
+    ``(None, error)``."""
+    if not signature_is_valid(request.body, request.META.get(SIGNATURE_HEADER)):
+        return None, JsonResponse({'status': 'invalid signature'}, status=401)
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return None, JsonResponse({'status': 'error'}, status=400)
+    if not isinstance(data, dict):
+        return None, JsonResponse({'status': 'error'}, status=400)
+    return data, None
@@ -0,0 +1,78 @@
+"""
+Warm a freshly started worker before it takes traffic.
+
+Called from gunicorn's ``post_worker_init`` hook (see gunicorn.conf.py),
+so the first shopper after a cold start doesn't pay for loading the
+URLconf and views, compiling the storefront templates, waking the
+database or rendering the catalog.  Each step is timed as a startup
+phase (see KONNECT_INC.startup) and a failing step is logged and
+skipped: a worker must come up even if the database is still asleep.
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import connections
+from django.template.loader import get_template
+from django.urls import get_resolver
+
+from KONNECT_INC.startup import phase
+
+
+logger = logging.getLogger(__name__)
+
+
+STOREFRONT_TEMPLATES = ('html/landing.html', 'html/index.html', 'html/wholesale.html')
+
+
+def _urls():
+    # Imports every view module the URLconf points at.
+    get_resolver().url_patterns
+
+
+def _database():
+    # Connections are per thread, so this one isn't handed to requests;
+    # it wakes the server and checks credentials, and the request threads
+    # then connect to a database that's already up.
+    for alias in connections:
+        connections[alias].ensure_connection()
+
+
+def _templates():
+    # With DEBUG off the cached loader keeps the compiled templates for
+    # the life of the process.
+    for name in STOREFRONT_TEMPLATES:
+        get_template(name)
+
+
+def _catalog():
+    from .catalog import get_rendered_page
+
+    get_rendered_page('retail', 'html/index.html')
+    get_rendered_page('wholesale', 'html/wholesale.html')
+
+
+STEPS = (
+    ('urls', _urls),
+    ('database', _database),
+    ('templates', _templates),
+    ('catalog', _catalog),
+)
+
+
+def warm_up():
+    """Run every warm-up step; returns the names of the ones that failed."""
+    failed = []
+    if not settings.STARTUP_WARMUP:
+        return failed
+    for name, step in STEPS:
+        with phase(f'warm {name}'):
+            try:
+                step()
+            except Exception:
+                logger.warning('Warm-up step %r failed', name, exc_info=True)
+                failed.append(name)
+    # Requests are served on other threads; don't leave this thread's
+    # connection idling against the server's limit.
+    connections.close_all()
+    return failed